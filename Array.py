@@ -1,6 +1,9 @@
 
 import numpy as np
-from PyQt5.QtWidgets import *
+
+import FarField
+import FieldEngine
+import PatternEngine
 
 class FrequencyComponent:
     def __init__(self, frequency=1000, phase=0, amplitude=1.0):
@@ -36,46 +39,32 @@ class Array:
         self.steering_angle = angle 
         print(f"target degree : {self.steering_angle}")
     def calculate_beam_pattern(self, theta):
-        af = np.zeros_like(theta, dtype=complex)
-        for comp in self.components:
-            k = 2 * np.pi * comp.frequency / self.c
-            wavelength = self.c / comp.frequency
-            d = self.spacing   # spacing in meters
-            psi = k * d * (np.cos(theta) - np.sin(np.radians(self.steering_angle)))
-            component_af = np.zeros_like(theta, dtype=complex)
-            for n in range(self.num_elements):
-                component_af += comp.amplitude * np.exp(1j * (n * psi + comp.phase))
-            af += component_af
+        af = PatternEngine.array_factor(self, theta)
         return 20 * np.log10(np.abs(af) / self.num_elements)
 
-    def calculate_field(self, x, y, is_decayed=True):
-        field = np.zeros((len(y), len(x)), dtype=complex)
-        if len(self.components) == 0:
-            return np.abs(field)
-        for comp in self.components:
-            k = 2 * np.pi * comp.frequency / self.c
-            wavelength = self.c / comp.frequency
-            component_field = np.zeros_like(field)
-            # Calculate element positions considering center, curvature and rotation
-            for n in range(self.num_elements):
-                d = self.spacing  
-                # Base position relative to center
-                x_offset = (n - (self.num_elements - 1)/2) * d
-                y_offset = self.curvature * x_offset**2  # Apply curvature
-                # Apply rotation
-                rot_angle = np.radians(self.rotation)
-                x_n = self.center[0] + x_offset * np.cos(rot_angle) - y_offset * np.sin(rot_angle)
-                y_n = self.center[1] + x_offset * np.sin(rot_angle) + y_offset * np.cos(rot_angle)
-                X, Y = np.meshgrid(x - x_n, y - y_n)
-                R = np.sqrt(X**2 + Y**2)
-                phase = (k * R + 
-                        n * k * d * np.sin(np.radians(self.steering_angle)) +
-                        comp.phase)
-                attenuation = 1.0 / (R + np.finfo(float).eps)  # Geometric spreading
-                frequency_attenuation = np.exp(-comp.frequency * R / (1e6 * self.c))  # Frequency-dependent attenuation
-                component_field += comp.amplitude * attenuation * frequency_attenuation * np.exp(1j * phase)
-                
-            field += component_field
-        return 20 * np.log10(np.abs(field))
+    def calculate_complex_field(self, x, y, basis_cache=None, precision='double', far_field_tolerance=None,
+                                backend='numpy'):
+        # Linear complex field; combine arrays with FieldEngine.combine_fields
+        # before converting to dB. A far_field_tolerance in dB lets distant
+        # pixels use the far-field form (FarField.hybrid_field); `backend`
+        # picks the element-sum kernel (FieldEngine.BACKENDS).
+        if far_field_tolerance is not None:
+            return FarField.hybrid_field(self, x, y, far_field_tolerance, basis_cache=basis_cache,
+                                         precision=precision, backend=backend)
+        return FieldEngine.complex_field(self, x, y, basis_cache=basis_cache, precision=precision, backend=backend)
 
+    def probe_complex_field(self, px, py, precision='double'):
+        # Complex field at the points (px[i], py[i]) only, without a grid
+        return FieldEngine.probe_field(self, px, py, precision=precision)
 
+    def probe_field(self, px, py, precision='double'):
+        return FieldEngine.to_db(self.probe_complex_field(px, py, precision=precision))
+
+    def calculate_field(self, x, y, is_decayed=True, basis_cache=None, precision='double', far_field_tolerance=None,
+                        backend='numpy'):
+        # precision='single' works in float32/complex64 and returns float32
+        if len(self.components) == 0:
+            return np.zeros((len(y), len(x)), dtype=FieldEngine.PRECISIONS[precision][0])
+        return FieldEngine.to_db(self.calculate_complex_field(x, y, basis_cache=basis_cache, precision=precision,
+                                                              far_field_tolerance=far_field_tolerance,
+                                                              backend=backend))
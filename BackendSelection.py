@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import platform
+import time
+
+import numpy as np
+
+from Array import Array, FrequencyComponent
+import FieldEngine
+
+logger = logging.getLogger('beam_forming')
+
+# Where the choice is kept between launches
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.beam_forming', 'backend.json')
+BENCHMARK_REPEAT = 3
+# Relative to the reference implementation's peak; single precision is not
+# used for the choice
+BENCHMARK_TOL = 1e-9
+# Bumped when the timed scenes change, so earlier choices are timed again
+BENCHMARK_VERSION = 2
+
+
+def machine_info():
+    # What timings depend on; a saved choice for different values is rerun,
+    # and benchmarks/suite.py keeps one baseline per value
+    cpu = platform.processor() or platform.machine()
+    if os.path.exists('/proc/cpuinfo'):
+        with open('/proc/cpuinfo') as file:
+            for line in file:
+                if line.startswith('model name'):
+                    cpu = line.split(':', 1)[1].strip()
+                    break
+    installed = [name for name, (_, is_installed) in FieldEngine.BACKENDS.items() if is_installed()]
+    return {'system': platform.system(), 'machine': platform.machine(), 'cpu': cpu, 'cpus': os.cpu_count(),
+            'python': platform.python_version(), 'numpy': np.__version__, 'backends': installed}
+
+
+def _benchmark_scenes():
+    # Typical GUI maps on a 200x200 grid: a new array's single 1 kHz tone,
+    # and 32 elements with a harmonic pair plus an unrelated tone, as
+    # FieldEngine.harmonic_groups only speeds up the former
+    single = Array(center=(0, 0), num_elements=32, spacing=0.05, curvature=0.1)
+    single.set_steering_angle(20)
+    single.components = [FrequencyComponent(1000, 0.0, 1.0)]
+    mixed = Array(center=(0, 0), num_elements=32, spacing=0.05, curvature=0.1)
+    mixed.set_steering_angle(20)
+    mixed.components = [FrequencyComponent(1000, 0.0, 1.0), FrequencyComponent(1300, 0.6, 0.7),
+                        FrequencyComponent(2000, 0.3, 0.5)]
+    x, y = np.linspace(-15, 15, 200), np.linspace(0, 10, 200)
+    return [(single, x, y), (mixed, x, y)]
+
+
+def benchmark_backends(repeat=BENCHMARK_REPEAT):
+    """Median seconds for the benchmark scenes with every usable backend, {name: seconds}.
+
+    A backend is left out when it is unavailable here or its field for any
+    scene is further than BENCHMARK_TOL from FieldEngine.reference_field.
+    The untimed first call includes any compilation.
+    """
+    scenes = _benchmark_scenes()
+    expected = [FieldEngine.reference_field(array, x, y) for array, x, y in scenes]
+    timings = {}
+    for name in FieldEngine.BACKENDS:
+        if not FieldEngine.backend_available(name):
+            continue
+        error = max(float(np.max(np.abs(FieldEngine.complex_field(array, x, y, backend=name) - reference))
+                          / np.max(np.abs(reference))) for (array, x, y), reference in zip(scenes, expected))
+        if error > BENCHMARK_TOL:
+            logger.warning(f"Field backend {name} is {error:.2e} from the reference, not selected")
+            continue
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for array, x, y in scenes:
+                FieldEngine.complex_field(array, x, y, backend=name)
+            times.append(time.perf_counter() - start)
+        timings[name] = float(np.median(times))
+    return timings
+
+
+def load_selection(path=DEFAULT_PATH):
+    # The saved record, or None when missing, unreadable, from other hardware
+    # or from other benchmark scenes
+    try:
+        with open(path) as file:
+            record = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if (record.get('machine') != machine_info() or record.get('benchmark') != BENCHMARK_VERSION
+            or record.get('backend') not in FieldEngine.BACKENDS):
+        return None
+    return record
+
+
+def select_backend(path=DEFAULT_PATH, rerun=False):
+    """The fastest correct backend for this machine.
+
+    The first call on a machine (or after the installed backends, Python or
+    NumPy change, or with `rerun`) times every backend with
+    benchmark_backends and saves the result to `path`; later calls just
+    read it back.
+    """
+    record = None if rerun else load_selection(path)
+    if record is not None:
+        return record['backend']
+    logger.info('Timing field backends for this machine...')
+    timings = benchmark_backends()
+    backend = min(timings, key=timings.get)
+    logger.info(f"Selected field backend {backend}: "
+                + ", ".join(f"{name} {seconds * 1e3:.1f} ms" for name, seconds in timings.items()))
+    record = {'backend': backend, 'timings': timings, 'machine': machine_info(), 'benchmark': BENCHMARK_VERSION,
+              'selected': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(record, file, indent=4)
+    except OSError as e:
+        logger.warning(f"Could not save the backend choice to {path}: {e}")
+    return backend
@@ -2,11 +2,18 @@
 import numpy as np
 from PyQt5.QtWidgets import *
 
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
 
 from Array import Array
+import PatternEngine
+from Profiler import span
+
+STANDARD_ANGLES = 300
+# Half width of the zoomed view around the main lobe; its center snaps to
+# ZOOM_STEP so small steering changes keep the axes and only blit the curve
+ZOOM_HALF_WIDTH = np.radians(10)
+ZOOM_STEP = np.radians(5)
 
 
 class PolarPlotWidget(QWidget):
@@ -23,25 +30,73 @@ class PolarPlotWidget(QWidget):
         self.ax.set_theta_direction(-1)
         self.figure.tight_layout()
         self.ax.set_position([0.0, -0.3, 1, 1.6])
+        self.ax.grid(True)
+        # The curve is the only thing that moves: it is left out of full
+        # redraws and blitted over the cached grid and labels
+        self.line, = self.ax.plot([], [], animated=True)
+        self.rlim = None
+        self.view = (-np.pi, 0.0)
+        self.background = None
+        # 'standard' samples STANDARD_ANGLES evenly in theta, 'dense'
+        # PatternEngine.DENSE_ANGLES evenly in cos(theta)
+        self.resolution = 'standard'
+        self.zoom = False
+        self.canvas.mpl_connect('draw_event', self.on_draw)
 
         layout.addWidget(self.canvas)
-    def update_plot(self,array:Array):
+    def set_resolution(self, resolution):
+        if resolution not in ('standard', 'dense'):
+            raise ValueError(f"Unknown pattern resolution: {resolution}")
+        self.resolution = resolution
 
-        theta = np.linspace(0, -np.pi, 300)
-        af = array.calculate_beam_pattern(theta)
+    def angles(self, array:Array=None):
+        # The whole half plane, or with zoom a window around the array's main lobe
+        start, stop = 0.0, -np.pi
+        if self.zoom and array is not None:
+            center = np.round(PatternEngine.main_lobe_angle(array) / ZOOM_STEP) * ZOOM_STEP
+            start, stop = min(0.0, center + ZOOM_HALF_WIDTH), max(-np.pi, center - ZOOM_HALF_WIDTH)
+        if self.resolution == 'dense':
+            return PatternEngine.dense_angles(start, stop)
+        return np.linspace(start, stop, STANDARD_ANGLES)
 
-        self.ax.clear()
-        self.ax.set_thetamin(-180)
-        self.ax.set_thetamax(0)
-        self.ax.set_theta_zero_location('E')
-        self.ax.set_theta_direction(-1)
+    def compute_pattern(self, array:Array, theta):
+        # Pure numpy, safe to call from a worker thread
+        with span('polar compute'):
+            return array.calculate_beam_pattern(theta)
+
+    def update_plot(self,array:Array):
+        theta = self.angles(array)
+        self.show_pattern(theta, self.compute_pattern(array, theta))
+
+    def show_pattern(self, theta, af):
         af_db = af
         af_norm = af_db - np.max(af_db)
         af_norm = np.clip(af_norm, -40, 0)
-        self.ax.plot(theta, af_norm)
-        self.ax.set_rticks(np.arange(np.floor(np.min(af_norm)), np.ceil(np.max(af_norm))+1, 10))
-        self.ax.set_rlim(np.floor(np.min(af_norm)), np.ceil(np.max(af_norm)))
-        self.ax.grid(True)
-        self.ax.set_position([0.0, -0.3, 1, 1.6])
+        self.line.set_data(theta, af_norm)
+        if self.zoom:
+            # A window may hold little more than the main lobe; a fixed
+            # radial range keeps the axes while steering
+            rlim = (-40.0, 0.0)
+        else:
+            rlim = (np.floor(np.min(af_norm)), np.ceil(np.max(af_norm)))
+        view = (float(np.min(theta)), float(np.max(theta)))
+        if rlim != self.rlim or view != self.view or self.background is None:
+            # Axes changed: the static background has to be redrawn
+            self.rlim = rlim
+            self.ax.set_rticks(np.arange(rlim[0], rlim[1]+1, 10))
+            self.ax.set_rlim(*rlim)
+            if view != self.view:
+                self.view = view
+                self.ax.set_thetamin(np.degrees(view[0]))
+                self.ax.set_thetamax(np.degrees(view[1]))
+            with span('polar draw'):
+                self.canvas.draw()
+            return
+        with span('polar blit'):
+            self.canvas.restore_region(self.background)
+            self.ax.draw_artist(self.line)
+            self.canvas.blit(self.figure.bbox)
 
-        self.canvas.draw()
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.ax.draw_artist(self.line)
@@ -0,0 +1,141 @@
+import copy
+import logging
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+logger = logging.getLogger('beam_forming')
+
+
+def snapshot_arrays(arrays):
+    # Jobs work on private copies so the GUI can keep editing the live arrays
+    return copy.deepcopy(list(arrays))
+
+
+class _JobSignals(QObject):
+    pattern_ready = pyqtSignal(int, object, object)
+    field_ready = pyqtSignal(int, object, object, object)
+    harmonics_ready = pyqtSignal(int, object, object, object)
+    failed = pyqtSignal(int, str)
+    done = pyqtSignal(object)
+
+
+class SimulationJob(QRunnable):
+    """Beam pattern of the selected array, then the interference map.
+
+    While the map is animating, the per-frequency complex fields take the
+    place of the map.
+    """
+    def __init__(self, generation, arrays, selected, grid, display_shape, dispatcher):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.generation = generation
+        self.arrays = arrays
+        self.grid = grid
+        self.display_shape = display_shape
+        self.selected = selected
+        self.dispatcher = dispatcher
+        self.signals = dispatcher.job_signals
+
+    def is_stale(self):
+        return self.generation != self.dispatcher.generation
+
+    def run(self):
+        try:
+            if self.is_stale():
+                return
+            if self.selected is not None:
+                polar_plot = self.dispatcher.polar_plot
+                theta = polar_plot.angles(self.arrays[self.selected])
+                af = polar_plot.compute_pattern(self.arrays[self.selected], theta)
+                if self.is_stale():
+                    return
+                self.signals.pattern_ready.emit(self.generation, theta, af)
+            if len(self.arrays) == 0:
+                return
+            field_plot = self.dispatcher.field_plot
+            x, y = self.grid
+            if field_plot.animating:
+                harmonics = field_plot.compute_harmonics(self.arrays, x, y)
+                if self.is_stale():
+                    return
+                self.signals.harmonics_ready.emit(self.generation, x, y, harmonics)
+                return
+            if field_plot.progressive:
+                for x, y, field in field_plot.progressive_passes(self.arrays, x, y, self.display_shape,
+                                                               is_cancelled=self.is_stale):
+                    if self.is_stale():
+                        return
+                    self.signals.field_ready.emit(self.generation, x, y, field)
+                return
+            field = field_plot.compute_field(self.arrays, x, y, is_cancelled=self.is_stale)
+            if field is None or self.is_stale():
+                return
+            self.signals.field_ready.emit(self.generation, x, y, field)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+        finally:
+            self.signals.done.emit(self)
+
+
+class ComputeDispatcher(QObject):
+    """Runs field and beam-pattern computation off the GUI thread.
+
+    Every submit() supersedes the previous one: a queued job that has not
+    started is taken back from the pool, a running one stops at its next
+    check, and results from any older generation are dropped on arrival.
+    """
+    pattern_ready = pyqtSignal(object, object)
+    field_ready = pyqtSignal(object, object, object)
+    harmonics_ready = pyqtSignal(object, object, object)
+
+    def __init__(self, field_plot, polar_plot, parent=None):
+        super().__init__(parent)
+        self.field_plot = field_plot
+        self.polar_plot = polar_plot
+        self.generation = 0
+        # One worker: the widgets' caches are not shared between threads, and
+        # only the newest job matters anyway
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self._queued = None
+        self._jobs = set()
+        self.job_signals = _JobSignals(self)
+        self.job_signals.pattern_ready.connect(self._on_pattern_ready)
+        self.job_signals.field_ready.connect(self._on_field_ready)
+        self.job_signals.harmonics_ready.connect(self._on_harmonics_ready)
+        self.job_signals.failed.connect(self._on_failed)
+        self.job_signals.done.connect(self._jobs.discard)
+
+    def submit(self, arrays, selected=None):
+        self.generation += 1
+        if self._queued is not None and self.pool.tryTake(self._queued):
+            self._jobs.discard(self._queued)
+        # The grid depends on widget geometry, so it is read on the GUI thread
+        grid = self.field_plot.grid(arrays)
+        job = SimulationJob(self.generation, snapshot_arrays(arrays), selected, grid,
+                            self.field_plot.display_shape(), self)
+        self._jobs.add(job)
+        self._queued = job
+        self.pool.start(job)
+
+    def cancel(self):
+        # Drops whatever is in flight without submitting new work
+        self.generation += 1
+
+    def wait(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
+
+    def _on_pattern_ready(self, generation, theta, af):
+        if generation == self.generation:
+            self.pattern_ready.emit(theta, af)
+
+    def _on_field_ready(self, generation, x, y, field):
+        if generation == self.generation:
+            self.field_ready.emit(x, y, field)
+
+    def _on_harmonics_ready(self, generation, x, y, harmonics):
+        if generation == self.generation:
+            self.harmonics_ready.emit(x, y, harmonics)
+
+    def _on_failed(self, generation, message):
+        logger.error(f"Simulation job {generation} failed: {message}")
@@ -0,0 +1,130 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class LRUCache:
+    """Least-recently-used store of numpy arrays bounded by total bytes."""
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key).nbytes
+        if value.nbytes > self.max_bytes:
+            return value
+        # Cached arrays are shared between callers, so they must not be edited
+        value.flags.writeable = False
+        self._entries[key] = value
+        self.nbytes += value.nbytes
+        self._evict()
+        return value
+
+    def make_room(self, nbytes, keep=()):
+        # Evicts least recently used entries, other than those in `keep`,
+        # until `nbytes` more fit
+        for key in [key for key in self._entries if key not in keep]:
+            if self.nbytes + nbytes <= self.max_bytes:
+                break
+            self.nbytes -= self._entries.pop(key).nbytes
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._entries:
+            _, value = self._entries.popitem(last=False)
+            self.nbytes -= value.nbytes
+
+
+def array_key(array):
+    # Everything calculate_field reads from the array: geometry, medium,
+    # steering and the frequency components
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((array.num_elements, float(array.spacing), float(array.curvature),
+                   float(array.rotation), float(array.c), float(array.steering_angle))).encode())
+    h.update(np.asarray(array.center, dtype=float).tobytes())
+    for comp in array.components:
+        h.update(repr((float(comp.frequency), float(comp.phase), float(comp.amplitude))).encode())
+    return h.hexdigest()
+
+
+def grid_key(x, y):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(x, dtype=float).tobytes())
+    h.update(b'|')
+    h.update(np.ascontiguousarray(y, dtype=float).tobytes())
+    return h.hexdigest()
+
+
+class FieldCache(LRUCache):
+    """Per-array complex fields keyed by array state and grid.
+
+    Fields are kept linear so any set of cached arrays can be combined with
+    FieldEngine.combine_fields. Misses are computed through `basis_cache`
+    when one is given, in the current `precision` ('double' or 'single')
+    and `far_field_tolerance` (None for the exact sum), which are part of
+    the key. The element-sum `backend` is not: every backend is validated
+    against the NumPy result.
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, basis_cache=None, precision='double',
+                 far_field_tolerance=None, backend='numpy'):
+        super().__init__(max_bytes)
+        self.basis_cache = basis_cache
+        self.precision = precision
+        self.far_field_tolerance = far_field_tolerance
+        self.backend = backend
+
+    def _mode(self):
+        return self.precision, self.far_field_tolerance
+
+    def field(self, array, x, y):
+        key = (array_key(array), grid_key(x, y), self._mode())
+        field = self.get(key)
+        if field is None:
+            field = self.put(key, array.calculate_complex_field(x, y, basis_cache=self.basis_cache,
+                                                                precision=self.precision,
+                                                                far_field_tolerance=self.far_field_tolerance,
+                                                                backend=self.backend))
+        return field
+
+    def fields(self, arrays, x, y, calculate):
+        # Looks every array up and hands all misses to `calculate` in one
+        # batch, e.g. a process pool; calculate(arrays, x, y) -> list of
+        # complex fields
+        grid = grid_key(x, y)
+        keys = [(array_key(array), grid, self._mode()) for array in arrays]
+        fields = [self.get(key) for key in keys]
+        missing = [i for i, field in enumerate(fields) if field is None]
+        if missing:
+            computed = calculate([arrays[i] for i in missing], x, y)
+            for i, field in zip(missing, computed):
+                fields[i] = self.put(keys[i], field)
+        return fields
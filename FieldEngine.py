@@ -0,0 +1,591 @@
+import hashlib
+import logging
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from FieldCache import LRUCache, grid_key
+import NumbaField
+import NumexprField
+from Profiler import span
+
+logger = logging.getLogger('beam_forming')
+
+# Element-pixel pairs evaluated per chunk. Small enough that the chunk's
+# temporaries stay in cache, and peak memory no longer grows with num_elements.
+DEFAULT_CHUNK_POINTS = 1 << 15
+# The streamed element sum walks the grid in bands of about this many pixels,
+# so a chunk covers many elements of a band rather than a whole grid of one
+BAND_PIXELS = 2048
+
+# exp(j*theta) is a lookup in a table of 2**PHASOR_BITS unit phasors times
+# 1 - eps**2/2 + j*eps for the remainder (|eps| <= pi / 2**PHASOR_BITS), off
+# by at most |eps|**3/6 = 2e-14 and far cheaper than np.exp on complex input.
+PHASOR_BITS = 16
+_PHASOR_SIZE = 1 << PHASOR_BITS
+_PHASOR_TABLE = np.exp(2j * np.pi * np.arange(_PHASOR_SIZE) / _PHASOR_SIZE)
+_PHASOR_COS = np.ascontiguousarray(_PHASOR_TABLE.real)
+_PHASOR_SIN = np.ascontiguousarray(_PHASOR_TABLE.imag)
+_PHASOR_TABLES = {
+    np.dtype(np.float64): _PHASOR_TABLE,
+    np.dtype(np.float32): _PHASOR_TABLE.astype(np.complex64),
+}
+
+# exp((jk - alpha) * R) is exp(s * f * R) with the same s for every frequency
+# f, so components at whole multiples (up to this one) of a group's lowest
+# frequency take powers of its term instead of a phasor each
+MAX_HARMONIC = 8
+
+# Real and complex working types of each precision mode. In 'single' every
+# per-pixel array (distances, phasors, bases, the field) is float32/complex64;
+# only the per-element offsets and weights are formed in float64 first.
+#
+# Phase is carried in turns (R * f / c) and reduced to its fraction with
+# an exact subtraction before it is scaled, so no precision is lost to the
+# integer number of wavelengths. What remains is float32 rounding of R
+# itself: the phase error is at most about 2*pi * 4 * 2**-24 * R_max / lambda
+# radians, e.g. 0.02 rad at 40 GHz over 100 m (5G.json). Wherever
+# |F| >= S / 10, with S the sum of the magnitudes of the element terms,
+# this keeps single precision within 20*log10(1 + 10 * phase_error) dB of
+# double: 1.6 dB in that worst case (0.19 dB measured) and below 0.01 dB
+# for the acoustic scenarios. Closer to a null the relative error grows
+# as S / |F|.
+PRECISIONS = {
+    'double': (np.float64, np.complex128),
+    'single': (np.float32, np.complex64),
+}
+
+# How combine_fields adds arrays: 'coherent' sums complex fields, so arrays
+# interfere; 'incoherent' sums intensities, as for uncorrelated sources
+COMBINE_MODES = ('coherent', 'incoherent')
+
+# Registry of kernels for the element sum of components without a cached
+# basis, name -> (add_field, installed); see register_backend. Filled in at
+# the end of this module.
+BACKENDS = {}
+# Largest deviation from the 'numpy' kernel, relative to the peak, that a
+# backend may show on the validation scene before it is refused
+VALIDATION_TOL = 1e-5
+_backend_status = {}
+
+# Element bases for the UI maximum (128 elements, a few components, 200x200)
+# fit comfortably in this budget
+DEFAULT_BASIS_BYTES = 512 * 1024 * 1024
+
+
+def element_layout(n, num_elements, spacing, curvature, rotation, center):
+    # Positions of elements `n` considering center, curvature and rotation;
+    # n, num_elements and spacing broadcast, e.g. against Sweep's parameter axes
+    x_offset = (n - (num_elements - 1) / 2) * spacing
+    y_offset = curvature * x_offset**2
+    rot_angle = np.radians(rotation)
+    x_n = center[0] + x_offset * np.cos(rot_angle) - y_offset * np.sin(rot_angle)
+    y_n = center[1] + x_offset * np.sin(rot_angle) + y_offset * np.cos(rot_angle)
+    return x_n, y_n
+
+
+def element_positions(array):
+    return element_layout(np.arange(array.num_elements), array.num_elements, array.spacing, array.curvature,
+                          array.rotation, array.center)
+
+
+def scene_extent(arrays, target=None, base=(-15, 15, 0, 10), margin=2.0):
+    # Grows the `base` view, with a margin, on the sides where an element or
+    # the target would fall outside it
+    xs = [base[0], base[1]]
+    ys = [base[2], base[3]]
+    for array in arrays:
+        x_n, y_n = element_positions(array)
+        xs.extend(x_n)
+        ys.extend(y_n)
+    if target is not None:
+        xs.append(target[0])
+        ys.append(target[1])
+    x0, x1, y0, y1 = base
+    return [
+        float(min(xs)) - margin if min(xs) < x0 else x0,
+        float(max(xs)) + margin if max(xs) > x1 else x1,
+        float(min(ys)) - margin if min(ys) < y0 else y0,
+        float(max(ys)) + margin if max(ys) > y1 else y1,
+    ]
+
+
+def steering_weights(n, frequency, c, spacing, steering_angle, amplitude, phase):
+    # Complex drive of elements `n`: amplitude, steering progression and
+    # component phase folded into a single factor; every argument broadcasts
+    k = 2 * np.pi * frequency / c
+    steering = n * k * spacing * np.sin(np.radians(steering_angle))
+    return amplitude * np.exp(1j * (steering + phase))
+
+
+def element_weights(array, comp):
+    # steering_weights of every element for one component
+    return steering_weights(np.arange(array.num_elements), comp.frequency, array.c, array.spacing,
+                            array.steering_angle, comp.amplitude, comp.phase)
+
+
+def _chunk_size(num_elements, grid_size, chunk_points):
+    return int(np.clip(chunk_points // max(grid_size, 1), 1, max(num_elements, 1)))
+
+
+class _Workspace:
+    """Named scratch buffers, reused at whatever shape each chunk needs.
+
+    Chunk-sized temporaries are large enough that the allocator maps fresh
+    pages for every one, and faulting those in costs more than the
+    arithmetic done on them; a streamed sum draws them from here instead.
+    """
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name, shape, dtype):
+        size = math.prod(shape)
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size < size or buffer.dtype != dtype:
+            buffer = self._buffers[name] = np.empty(size, dtype=dtype)
+        return buffer[:size].reshape(shape)
+
+
+def _phasor(cycles, amplitude=None, out=None, work=None):
+    # amplitude * exp(2j*pi*cycles) for a real array of phase turns, in its
+    # precision, into `out`; `amplitude` is a real array of the same shape.
+    # `cycles` is overwritten, and temporaries come from the _Workspace `work`.
+    real = cycles.dtype
+    if work is None:
+        work = _Workspace()
+    if out is None:
+        out = np.empty(cycles.shape, dtype=_PHASOR_TABLES[real].dtype)
+    t = cycles
+    m = work.get('phasor whole', t.shape, real)
+    if real == np.float32:
+        # Whole turns are dropped first: cycles - rint(cycles) is exact, so
+        # the fraction keeps every bit it has before the table scaling, which
+        # would otherwise push large turn counts past float32's 24 bits
+        np.rint(t, out=m)
+        t -= m
+    t *= _PHASOR_SIZE
+    np.rint(t, out=m)
+    t -= m
+    index = work.get('phasor index', t.shape, np.intp)
+    np.copyto(index, m, casting='unsafe')
+    index &= _PHASOR_SIZE - 1
+    np.take(_PHASOR_TABLES[real], index, out=out, mode='clip')
+    t *= real.type(2 * np.pi / _PHASOR_SIZE)
+    re = m
+    np.multiply(t, t, out=re)
+    re *= real.type(-0.5)
+    re += 1
+    remainder = work.get('phasor remainder', t.shape, out.dtype)
+    if amplitude is None:
+        remainder.real = re
+        remainder.imag = t
+    else:
+        np.multiply(re, amplitude, out=remainder.real)
+        np.multiply(t, amplitude, out=remainder.imag)
+    out *= remainder
+    return out
+
+
+def _propagation(R, frequency, c, amplitude=None, out=None, work=None):
+    # amplitude * exp(1j*k*R) * exp(-alpha*R) into `out`; `frequency` is one
+    # frequency or an array that broadcasts against R
+    real = R.dtype.type
+    if work is None:
+        work = _Workspace()
+    shape = np.broadcast_shapes(R.shape, np.shape(frequency))
+    alpha = frequency / (1e6 * c)  # Frequency-dependent attenuation
+    decay = np.multiply(R, real(-alpha), out=work.get('decay', shape, R.dtype))
+    np.exp(decay, out=decay)
+    if amplitude is not None:
+        decay *= amplitude
+    cycles = np.multiply(R, real(frequency / c), out=work.get('cycles', shape, R.dtype))
+    return _phasor(cycles, decay, out, work)
+
+
+def _basis_chunk(R, attenuation, frequency, c):
+    # exp(1j*k*R) * exp(-alpha*R) / R for one component
+    return _propagation(R, frequency, c, attenuation)
+
+
+def harmonic_groups(streamed):
+    """Components of `streamed`, [(component, weights)], by harmonic series.
+
+    Returns [(base frequency, [weights of multiple 1, 2, ...])] with None
+    for a missing multiple; weights of equal frequencies are added. A
+    component joins the first group whose base it is a whole multiple of,
+    at most MAX_HARMONIC, and otherwise starts a group of its own.
+    """
+    groups = []
+    for comp, w in sorted(streamed, key=lambda item: item[0].frequency):
+        frequency = float(comp.frequency)
+        for base, weights in groups:
+            multiple = round(frequency / base) if base > 0 else (1 if frequency == 0 else 0)
+            if 1 <= multiple <= MAX_HARMONIC and abs(frequency - multiple * base) <= 1e-12 * frequency:
+                weights.extend([None] * (multiple - len(weights)))
+                weights[multiple - 1] = w if weights[multiple - 1] is None else weights[multiple - 1] + w
+                break
+        else:
+            groups.append((frequency, [w]))
+    return groups
+
+
+def _distance_chunk(x_n, y_n, x, y, real=np.float64):
+    # Offsets are taken in float64 and only then rounded to `real`, so they
+    # are as accurate as that type allows even far from the origin
+    dx = (x[None, None, :] - x_n[:, None, None]).astype(real, copy=False)
+    dy = (y[None, :, None] - y_n[:, None, None]).astype(real, copy=False)
+    R = np.sqrt(dx * dx + dy * dy)
+    attenuation = real(1.0) / (R + np.finfo(float).eps)  # Geometric spreading
+    return R, attenuation
+
+
+def element_basis(array, frequency, x, y, chunk_points=DEFAULT_CHUNK_POINTS, precision='double'):
+    """Unweighted complex field of every element, shape (elements, y, x).
+
+    Depends only on element positions, frequency, medium and grid, never on
+    steering or component phase/amplitude.
+    """
+    real, cplx = PRECISIONS[precision]
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    x_n, y_n = element_positions(array)
+    out = np.empty((array.num_elements, len(y), len(x)), dtype=cplx)
+    chunk = _chunk_size(array.num_elements, len(x) * len(y), chunk_points)
+    for start in range(0, array.num_elements, chunk):
+        stop = min(start + chunk, array.num_elements)
+        R, attenuation = _distance_chunk(x_n[start:stop], y_n[start:stop], x, y, real)
+        out[start:stop] = _basis_chunk(R, attenuation, frequency, array.c)
+    return out
+
+
+class ElementBasisCache(LRUCache):
+    """Element bases keyed by (element positions, frequency, medium, grid).
+
+    With the bases cached, a steering or phase change reduces the field to a
+    weighted sum over elements. A basis is only built the second time its key
+    is asked for, so dragging an array's position (new positions on every
+    event) keeps the cheaper streamed path instead of filling the cache. It
+    is only built at all when the bases of every frequency of the array fit
+    in `max_bytes` together, and building one never evicts another of them:
+    components that cannot all stay cached would push each other out on
+    every event and cost more than streaming.
+    """
+    def __init__(self, max_bytes=DEFAULT_BASIS_BYTES, max_pending=64):
+        super().__init__(max_bytes)
+        self.max_pending = max_pending
+        self._pending = OrderedDict()
+
+    def clear(self):
+        super().clear()
+        self._pending.clear()
+
+    def basis(self, array, frequency, x, y, precision='double'):
+        x_n, y_n = element_positions(array)
+        h = hashlib.blake2b(digest_size=16)
+        h.update(x_n.tobytes())
+        h.update(y_n.tobytes())
+        key = (h.hexdigest(), float(frequency), float(array.c), grid_key(x, y), precision)
+        basis = self.get(key)
+        if basis is not None:
+            return basis
+        frequencies = {float(comp.frequency) for comp in array.components} | {float(frequency)}
+        nbytes = array.num_elements * len(x) * len(y) * np.dtype(PRECISIONS[precision][1]).itemsize
+        if nbytes * len(frequencies) > self.max_bytes:
+            return None
+        if key not in self._pending:
+            self._pending[key] = True
+            if len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+            return None
+        del self._pending[key]
+        siblings = {(key[0], f, key[2], key[3], key[4]) for f in frequencies}
+        self.make_room(nbytes, keep=siblings)
+        return self.put(key, element_basis(array, frequency, x, y, precision=precision))
+
+
+def basis_bytes_per_pixel(arrays, precision='double'):
+    # What ElementBasisCache needs per grid pixel to hold the bases of every
+    # array: one per element and distinct frequency
+    itemsize = np.dtype(PRECISIONS[precision][1]).itemsize
+    return itemsize * sum(array.num_elements * len({float(comp.frequency) for comp in array.components})
+                          for array in arrays)
+
+
+def complex_field(array, x, y, chunk_points=DEFAULT_CHUNK_POINTS, basis_cache=None, precision='double',
+                  backend='numpy'):
+    """Complex field of `array` on the grid spanned by `x` and `y`.
+
+    Sums every element and frequency component in broadcast form, a band of
+    rows and a chunk of elements at a time, so R is built once per element
+    and pixel and shared by all components, and components in a harmonic
+    series share one phasor (harmonic_groups). Components whose element basis is available from
+    `basis_cache` are a single weighted sum instead. `precision` is a key of
+    PRECISIONS; 'single' returns complex64. `backend` names the kernel in
+    BACKENDS for the other components; one that is unavailable here falls
+    back to 'numpy'.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown field backend: {backend}")
+    cplx = PRECISIONS[precision][1]
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    field = np.zeros((len(y), len(x)), dtype=cplx)
+    if len(array.components) == 0 or array.num_elements == 0:
+        return field
+    streamed = []
+    for comp in array.components:
+        w = element_weights(array, comp).astype(cplx)
+        basis = None
+        if basis_cache is not None:
+            basis = basis_cache.basis(array, comp.frequency, x, y, precision)
+        if basis is None:
+            streamed.append((comp, w))
+        else:
+            field += np.tensordot(w, basis, axes=1)
+    if not streamed:
+        return field
+    if not backend_available(backend):
+        backend = 'numpy'
+    add_field, _ = BACKENDS[backend]
+    add_field(field, array, x, y, streamed, chunk_points)
+    return field
+
+
+def _add_numpy(field, array, x, y, streamed, chunk_points):
+    # A band of rows and a chunk of elements at a time through broadcast
+    # arrays, in the field's precision, all in _Workspace buffers. Each
+    # harmonic group costs one phasor per element and pixel; its other
+    # multiples are repeated products.
+    real = field.real.dtype.type
+    x_n, y_n = element_positions(array)
+    groups = harmonic_groups(streamed)
+    work = _Workspace()
+    # R**2 of a chunk is one broadcast sum of these; squared in float64 first
+    # so they are as accurate as `real` allows even far from the origin
+    dx2 = np.square(x[None, :] - x_n[:, None]).astype(real)
+    dy2 = np.square(y[None, :] - y_n[:, None]).astype(real)
+    rows = max(1, BAND_PIXELS // max(len(x), 1))
+    for top in range(0, len(y), rows):
+        band = field[top:top + rows]
+        chunk = _chunk_size(array.num_elements, band.size, chunk_points)
+        for start in range(0, array.num_elements, chunk):
+            stop = min(start + chunk, array.num_elements)
+            shape = (stop - start,) + band.shape
+            R = np.add(dx2[start:stop, None, :], dy2[start:stop, top:top + rows, None],
+                       out=work.get('R', shape, real))
+            np.sqrt(R, out=R)
+            attenuation = np.add(R, real(np.finfo(float).eps), out=work.get('attenuation', shape, real))
+            np.divide(real(1.0), attenuation, out=attenuation)  # Geometric spreading
+            basis = work.get('basis', shape, field.dtype)
+            for frequency, weights in groups:
+                if len(weights) == 1:
+                    _propagation(R, frequency, array.c, attenuation, basis, work)
+                    band += np.tensordot(weights[0][start:stop], basis, axes=1)
+                    continue
+                step = _propagation(R, frequency, array.c, out=work.get('step', shape, field.dtype), work=work)
+                np.multiply(step, attenuation, out=basis)
+                for multiple, w in enumerate(weights):
+                    if multiple > 0:
+                        basis *= step
+                    if w is not None:
+                        band += np.tensordot(w[start:stop], basis, axes=1)
+
+
+def _add_reference(field, array, x, y, streamed, chunk_points):
+    # One element and component at a time with np.exp in float64, as
+    # reference_field; the slowest, but with nothing to go wrong
+    x_n, y_n = element_positions(array)
+    for n in range(array.num_elements):
+        R = np.hypot(x[None, :] - x_n[n], y[:, None] - y_n[n])
+        for comp, w in streamed:
+            k = 2 * np.pi * comp.frequency / array.c
+            alpha = comp.frequency / (1e6 * array.c)
+            field += w[n] * np.exp(1j * k * R) * np.exp(-alpha * R) / (R + np.finfo(float).eps)
+
+
+def _add_compiled(module):
+    # Adapter for the NumexprField kernel, which takes plain arrays
+    def add_field(field, array, x, y, streamed, chunk_points):
+        x_n, y_n = element_positions(array)
+        module.add_field(field, x, y, x_n, y_n, np.array([w for _, w in streamed]),
+                         [comp.frequency for comp, _ in streamed], array.c)
+    return add_field
+
+
+def _add_numba(field, array, x, y, streamed, chunk_points):
+    # Harmonic groups are folded in the kernel like in _add_numpy
+    x_n, y_n = element_positions(array)
+    NumbaField.add_field(field, x, y, x_n, y_n, harmonic_groups(streamed), array.c)
+
+
+def register_backend(name, add_field, installed=None):
+    """Adds a kernel that complex_field can use as backend=`name`.
+
+    add_field(field, array, x, y, streamed, chunk_points) adds the element
+    sum of the components in `streamed`, [(component, element weights)], to
+    `field` in place. `installed()` says whether its dependencies can be
+    imported; it defaults to always.
+    """
+    BACKENDS[name] = (add_field, installed or (lambda: True))
+    _backend_status.pop(name, None)
+
+
+def backend_available(name):
+    """Whether backend `name` is installed and agrees with 'numpy'.
+
+    Checked once per process on a small steered two-component scene, which
+    also pays any compilation up front. A failure is logged and complex_field
+    then falls back to 'numpy'.
+    """
+    if name == 'numpy':
+        return True
+    status = _backend_status.get(name)
+    if status is None:
+        status = _backend_status[name] = _validate_backend(name)
+    return status
+
+
+def _validate_backend(name):
+    add_field, installed = BACKENDS[name]
+    if not installed():
+        return False
+    from Array import Array
+
+    array = Array(num_elements=16, spacing=0.05, center=(0.3, 0.0))
+    array.steering_angle = 20
+    array.add_frequency_component(3000, phase=0.5, amplitude=0.7)
+    x = np.linspace(-4, 4, 41)
+    y = np.linspace(0.1, 6, 37)
+    streamed = [(comp, element_weights(array, comp)) for comp in array.components]
+    expected = np.zeros((len(y), len(x)), dtype=complex)
+    _add_numpy(expected, array, x, y, streamed, DEFAULT_CHUNK_POINTS)
+    field = np.zeros_like(expected)
+    try:
+        add_field(field, array, x, y, streamed, DEFAULT_CHUNK_POINTS)
+    except Exception as e:
+        logger.warning(f"Field backend {name} unavailable, using numpy: {e}")
+        return False
+    error = float(np.max(np.abs(field - expected)) / np.max(np.abs(expected)))
+    if not error <= VALIDATION_TOL:
+        logger.warning(f"Field backend {name} deviates from numpy by {error:.2e}, using numpy")
+        return False
+    return True
+
+
+def probe_field(array, px, py, chunk_points=DEFAULT_CHUNK_POINTS, precision='double'):
+    """Complex field of `array` at the points (px[i], py[i]).
+
+    Same model as complex_field, broadcast over components x elements x
+    points, so the cost grows with the number of probes and not with any
+    grid. The result has the shape of `px`.
+    """
+    real, cplx = PRECISIONS[precision]
+    px, py = np.broadcast_arrays(np.asarray(px, dtype=float), np.asarray(py, dtype=float))
+    out = np.zeros(px.size, dtype=cplx)
+    if len(array.components) == 0 or array.num_elements == 0:
+        return out.reshape(px.shape)
+    x_n, y_n = element_positions(array)
+    w = np.array([element_weights(array, comp) for comp in array.components]).astype(cplx)
+    frequency = np.array([comp.frequency for comp in array.components], dtype=float)[:, None, None]
+    turns_per_meter = (frequency / array.c).astype(real)
+    alpha = (-frequency / (1e6 * array.c)).astype(real)
+    step = max(1, chunk_points // w.size)
+    for start in range(0, px.size, step):
+        stop = min(start + step, px.size)
+        dx = (px.ravel()[None, start:stop] - x_n[:, None]).astype(real, copy=False)
+        dy = (py.ravel()[None, start:stop] - y_n[:, None]).astype(real, copy=False)
+        R = np.sqrt(dx * dx + dy * dy)
+        attenuation = real(1.0) / (R + np.finfo(float).eps)
+        basis = _phasor(R * turns_per_meter, np.exp(alpha * R) * attenuation)
+        out[start:stop] = np.einsum('ce,cep->p', w, basis)
+    return out.reshape(px.shape)
+
+
+def probe_scene(arrays, px, py, mode='coherent', precision='double'):
+    # dB level of all `arrays` together at the probe points, combined like
+    # scene_field
+    px, py = np.broadcast_arrays(np.asarray(px, dtype=float), np.asarray(py, dtype=float))
+    if len(arrays) == 0:
+        return np.full(px.shape, -np.inf, dtype=PRECISIONS[precision][0])
+    return combine_fields((probe_field(array, px, py, precision=precision) for array in arrays), mode)
+
+
+def to_db(field):
+    # 20*log10(|F|) in the field's own precision
+    with span('dB conversion'):
+        magnitude = np.asarray(np.abs(field))
+        np.log10(magnitude, out=magnitude)
+        magnitude *= 20
+        return magnitude
+
+
+def combine_fields(fields, mode='coherent'):
+    """dB map of several arrays' complex fields, converted once.
+
+    'coherent' is 20*log10(|sum F|), 'incoherent' is 10*log10(sum |F|^2).
+    The inputs are left untouched, so cached fields can be passed directly.
+    """
+    if mode not in COMBINE_MODES:
+        raise ValueError(f"Unknown combine mode: {mode}")
+    fields = iter(fields)
+    first = next(fields, None)
+    if first is None:
+        raise ValueError("No fields to combine")
+    if mode == 'coherent':
+        total = first.copy()
+        for field in fields:
+            total += field
+        return to_db(total)
+    power = np.asarray(first.real**2 + first.imag**2)
+    for field in fields:
+        power += field.real**2
+        power += field.imag**2
+    with span('dB conversion'):
+        np.log10(power, out=power)
+        power *= 10
+        return power
+
+
+def scene_field(arrays, x, y, mode='coherent', basis_cache=None, precision='double', far_field_tolerance=None,
+                backend='numpy'):
+    # dB map of all `arrays` together; fields are produced one at a time,
+    # so only the running sum and one array's field are held
+    if len(arrays) == 0:
+        return np.full((len(y), len(x)), -np.inf, dtype=PRECISIONS[precision][0])
+    return combine_fields((array.calculate_complex_field(x, y, basis_cache=basis_cache, precision=precision,
+                                                         far_field_tolerance=far_field_tolerance, backend=backend)
+                           for array in arrays), mode)
+
+
+def reference_field(array, x, y):
+    # Original per-component, per-element loop; kept as the ground truth the
+    # vectorized engine is checked against
+    field = np.zeros((len(y), len(x)), dtype=complex)
+    for comp in array.components:
+        k = 2 * np.pi * comp.frequency / array.c
+        component_field = np.zeros_like(field)
+        for n in range(array.num_elements):
+            d = array.spacing
+            x_offset = (n - (array.num_elements - 1)/2) * d
+            y_offset = array.curvature * x_offset**2
+            rot_angle = np.radians(array.rotation)
+            x_n = array.center[0] + x_offset * np.cos(rot_angle) - y_offset * np.sin(rot_angle)
+            y_n = array.center[1] + x_offset * np.sin(rot_angle) + y_offset * np.cos(rot_angle)
+            X, Y = np.meshgrid(x - x_n, y - y_n)
+            R = np.sqrt(X**2 + Y**2)
+            phase = (k * R +
+                    n * k * d * np.sin(np.radians(array.steering_angle)) +
+                    comp.phase)
+            attenuation = 1.0 / (R + np.finfo(float).eps)
+            frequency_attenuation = np.exp(-comp.frequency * R / (1e6 * array.c))
+            component_field += comp.amplitude * attenuation * frequency_attenuation * np.exp(1j * phase)
+        field += component_field
+    return field
+
+
+register_backend('reference', _add_reference)
+register_backend('numpy', _add_numpy)
+register_backend('numexpr', _add_compiled(NumexprField), NumexprField.installed)
+# Computed in float64 per pixel whatever the precision
+register_backend('numba', _add_numba, NumbaField.installed)
@@ -1,58 +1,316 @@
-
+import time
 
 import numpy as np
+from PyQt5.QtCore import QTimer, pyqtSignal
 from PyQt5.QtWidgets import *
 
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
 from Array import Array
+from FieldCache import FieldCache
+from FieldEngine import (BACKENDS, COMBINE_MODES, PRECISIONS, ElementBasisCache, basis_bytes_per_pixel,
+                         combine_fields, scene_extent)
+import ProgressiveField
+from Profiler import span
+from TiledField import colormap_lut
+import WaveAnimation
+
+# The map always shows at least this region, and grows to take in every
+# array and the target
+DEFAULT_EXTENT = [-15, 15, 0, 10]
+FIT_MARGIN = 2.0  # meters around elements and target
+FIELD_AXES_POSITION = [0.0, 0.1, 0.9, 0.8]
+MIN_SAMPLES = 16
+MAX_SAMPLES = 2048
+FIELD_CMAP = 'jet'
+# The animated field is signed, so it gets a diverging map symmetric about 0
+ANIMATION_CMAP = 'RdBu_r'
+ANIMATION_FPS = 30
 
 class FieldPlotWidget(QWidget):
+    resized = pyqtSignal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.extent = list(DEFAULT_EXTENT)
         self.setup_ui()
+        self.field_cache = FieldCache(basis_cache=ElementBasisCache())
+        self.execution_mode = 'serial'
+        self.progressive = False
+        self.combine_mode = 'coherent'
+        self.workers = None
+        # `animating` asks compute jobs for per-frequency fields; `animation`
+        # is the running WaveAnimation once they have arrived
+        self.animating = False
+        self.animation = None
+        self.animation_pixels = None
+        self.animation_started = None
+        self.animation_timer = QTimer(self)
+        self.animation_timer.setInterval(int(1000 / ANIMATION_FPS))
+        self.animation_timer.timeout.connect(self.animation_frame)
         self.color = np.random.rand(3,)
         
     def setup_ui(self):
         layout = QVBoxLayout()
         self.figure = Figure()
         self.canvas = FigureCanvasQTAgg(self.figure)
-        self.ax_field = self.figure.add_subplot(111)
-        self.figure.tight_layout()
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_xlabel('x (m)')
+        self.ax.set_ylabel('y (m)')
+        # Created on the first field and then only updated in place
+        self.image = None
+        self.colorbar = None
+        # Animated: left out of full redraws and blitted on top of the cached
+        # background instead
+        self.target_marker, = self.ax.plot([], [], 'g*', markersize=15, label='Target Point',
+                                           animated=True, visible=False)
+        self.legend = None
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
         layout.addWidget(self.canvas)
         self.setLayout(layout)
-        
-    def update_plot(self, arrays:list[Array],extent = [-15, 15, 0, 10]):
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.resized.emit()
+
+    def fit_extent(self, arrays:list[Array], target=None):
+        self.extent = scene_extent(arrays, target, DEFAULT_EXTENT, FIT_MARGIN)
+        return self.extent
+
+    def pixel_size(self):
+        # Device pixels covered by the field axes; the Qt canvas already folds
+        # the screen's device pixel ratio into figure.dpi
+        width, height = self.figure.get_size_inches() * self.figure.dpi
+        return width * FIELD_AXES_POSITION[2], height * FIELD_AXES_POSITION[3]
+
+    def display_shape(self):
+        # (nx, ny) device pixels the image covers: with aspect='equal' it is
+        # the extent scaled to fit inside the axes box
+        x0, x1, y0, y1 = self.extent
+        width_px, height_px = self.pixel_size()
+        scale = min(width_px / (x1 - x0), height_px / (y1 - y0))
+        return round((x1 - x0) * scale), round((y1 - y0) * scale)
+
+    def grid(self, arrays=()):
+        # One sample per displayed pixel. Coarser when the element bases of
+        # `arrays` would not all fit in the basis cache at that resolution,
+        # so steering and phase edits stay a weighted sum instead of a full
+        # recompute; imshow scales the image up.
+        x0, x1, y0, y1 = self.extent
+        nx, ny = self.display_shape()
+        pixel_bytes = basis_bytes_per_pixel(arrays, self.field_cache.precision)
+        if nx * ny * pixel_bytes > self.field_cache.basis_cache.max_bytes:
+            # Rounded down, so the bases stay within the budget
+            shrink = np.sqrt(self.field_cache.basis_cache.max_bytes / (nx * ny * pixel_bytes))
+            nx, ny = int(nx * shrink), int(ny * shrink)
+        nx = int(np.clip(nx, MIN_SAMPLES, MAX_SAMPLES))
+        ny = int(np.clip(ny, MIN_SAMPLES, MAX_SAMPLES))
+        return np.linspace(x0, x1, nx), np.linspace(y0, y1, ny)
+
+    def set_execution_mode(self, mode, workers=None):
+        # 'serial' computes cache misses in this process, 'process' spreads
+        # them over a process pool
+        if mode not in ('serial', 'process'):
+            raise ValueError(f"Unknown execution mode: {mode}")
+        self.execution_mode = mode
+        self.workers = workers
+
+    def set_precision(self, precision):
+        # 'single' computes in float32/complex64; see FieldEngine.PRECISIONS
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        self.field_cache.precision = precision
+
+    def set_backend(self, backend):
+        # Element-sum kernel; see FieldEngine.BACKENDS
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown field backend: {backend}")
+        self.field_cache.backend = backend
+
+    def set_far_field_tolerance(self, tolerance_db):
+        # None sums every pixel exactly; otherwise pixels far enough from an
+        # array use the far-field form (FarField.hybrid_field)
+        self.field_cache.far_field_tolerance = tolerance_db
+
+    def set_combine_mode(self, mode):
+        # How the arrays add up; see FieldEngine.COMBINE_MODES
+        if mode not in COMBINE_MODES:
+            raise ValueError(f"Unknown combine mode: {mode}")
+        self.combine_mode = mode
+        if mode != 'coherent':
+            # Incoherent arrays have no instantaneous field to animate
+            self.stop_animation()
+
+    def compute_field(self, arrays:list[Array], x, y, is_cancelled=None):
+        # Pure numpy, safe to call from a worker thread. Returns the scene's
+        # dB map, or None when is_cancelled() turns true between arrays.
+        if self.execution_mode == 'process':
+            # Only pulled in once the process mode is actually used
+            import ParallelField
+            with span('field compute', arrays=len(arrays), mode='process'):
+                fields = self.field_cache.fields(arrays, x, y, lambda missing, x, y:
+                                                 ParallelField.calculate_complex_fields(
+                                                     missing, x, y, self.workers, self.field_cache.precision,
+                                                     self.field_cache.far_field_tolerance, self.field_cache.backend))
+        else:
+            fields = []
+            for i, array in enumerate(arrays):
+                if is_cancelled is not None and is_cancelled():
+                    return None
+                with span('field compute', array=i, samples=len(x) * len(y)):
+                    fields.append(self.field_cache.field(array, x, y))
+        # Arrays add up in the linear domain; dB is taken once for the scene
+        return combine_fields(fields, self.combine_mode)
+
+    def compute_harmonics(self, arrays:list[Array], x, y):
+        # Pure numpy like compute_field; the parts go through the field cache.
+        # Always a coherent sum, so the animation only runs in 'coherent' mode
+        return WaveAnimation.harmonic_fields(arrays, x, y, self.field_cache.field)
+
+    def animate(self, harmonics, extent):
+        # Starts the animation, or carries on with new fields without
+        # restarting the clock
+        self.animation = WaveAnimation.WaveAnimation(harmonics, lut=colormap_lut(ANIMATION_CMAP))
+        if self.animation_started is None:
+            self.animation_started = time.perf_counter()
+        self.animation_pixels = self.animation.pixels(time.perf_counter() - self.animation_started)
+        self.show_field(self.animation.out, extent)
+        if not self.animation_timer.isActive():
+            self.animation_timer.start()
+
+    def stop_animation(self):
+        # The image keeps the last frame until the next static field
+        self.animation_timer.stop()
+        self.animating = False
+        self.animation = None
+        self.animation_pixels = None
+        self.animation_started = None
+
+    def animation_frame(self):
+        if self.animation is None or self.image is None:
+            return
+        with span('animation frame'):
+            self.animation_pixels = self.animation.pixels(time.perf_counter() - self.animation_started)
+            # Kept in step for the fallback path and for the frame left on stop
+            self.image.set_data(self.animation.out)
+            self.blit_overlays()
+
+    def progressive_passes(self, arrays:list[Array], x, y, display_shape, is_cancelled=None):
+        # Coarse preview first, then full resolution, then idle refinement
+        # while the grid is still coarser than the `display_shape` pixels
+        return ProgressiveField.progressive_passes(
+            lambda xs, ys: self.compute_field(arrays, xs, ys, is_cancelled), x, y, max_shape=display_shape)
+
+    def clear_plot(self):
+        #remove plot
+        if self.image is not None:
+            self.image.set_visible(False)
+            self.colorbar.ax.set_visible(False)
+        self.hide_target_point()
+        self.canvas.draw()
+
+    def update_plot(self, arrays:list[Array],extent = None):
         if len(arrays) == 0:
-            #remove plot
-            self.ax_field.clear()
-            self.figure.clear()
-            self.canvas.draw()
+            self.clear_plot()
             return
-        x = np.linspace(-15, 15, 200)
-        y = np.linspace(0, 10, 200)
-        field = arrays[0].calculate_field(x,y)
-        for i, array in enumerate(arrays[1:], 1):
-            field += array.calculate_field(x,y)
+        if extent is None:
+            self.fit_extent(arrays)
+        else:
+            self.extent = list(extent)
+        x, y = self.grid(arrays)
+        self.show_field(self.compute_field(arrays, x, y))
+
+    def show_field(self, field, extent = None):
+        if extent is None:
+            extent = self.extent
+        extent = [float(v) for v in extent]
         # Normalize field to be above 0
         # field = field - np.min(field)
 
-        self.ax_field.clear()
-        self.figure.clear()
-        self.ax = self.figure.add_subplot(111)
+        with span('imshow/colorbar'):
+            if self.image is None:
+                self.image = self.ax.imshow(field, extent=extent, aspect='equal',
+                            cmap=FIELD_CMAP, origin='lower')
+                self.colorbar = self.figure.colorbar(self.image, ax=self.ax, orientation='vertical', fraction=0.046, pad=0.04,shrink=0.8)
+                self.ax.set_position(FIELD_AXES_POSITION)
+            else:
+                self.image.set_data(field)
+                if list(self.image.get_extent()) != extent:
+                    self.image.set_extent(extent)
+                    self.ax.set_xlim(extent[0], extent[1])
+                    self.ax.set_ylim(extent[2], extent[3])
+                self.image.set_visible(True)
+                self.colorbar.ax.set_visible(True)
+            if self.animation is None:
+                self.image.set_animated(False)
+                self.image.set_cmap(FIELD_CMAP)
+                self.image.autoscale()
+            else:
+                # Frames are blitted over the background; the colour range
+                # stays fixed so the fronts do not flicker
+                self.image.set_animated(True)
+                self.image.set_cmap(ANIMATION_CMAP)
+                self.image.set_clim(-self.animation.level, self.animation.level)
+        with span('field draw'):
+            self.canvas.draw()
 
-        im = self.ax.imshow(field, extent=extent, aspect='equal', 
-                    cmap='jet', origin='lower')
-        self.figure.colorbar(im, ax=self.ax, orientation='vertical', fraction=0.046, pad=0.04,shrink=0.8)
-        self.ax.set_xlabel('x (m)')
-        self.ax.set_ylabel('y (m)')
-        self.ax.set_position([0.0, 0.1, 0.9, 0.8])
-        self.canvas.draw()
+    def on_draw(self, event):
+        # Full redraws leave the marker (and an animated image) out; keep
+        # that frame as the blit background and put them back on top
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.draw_overlays()
+
+    def draw_overlays(self):
+        if self.image is not None and self.image.get_animated():
+            if self.animation_pixels is None or not self.draw_animation_pixels():
+                self.ax.draw_artist(self.image)
+        if self.target_marker.get_visible():
+            self.ax.draw_artist(self.target_marker)
+
+    def draw_animation_pixels(self):
+        # The grid has one sample per device pixel, so a coloured frame can
+        # go straight to the renderer, skipping imshow's resampling. Returns
+        # False when the image is not drawn 1:1 (e.g. capped at MAX_SAMPLES).
+        x0, x1, y0, y1 = self.image.get_extent()
+        (left, bottom), (right, top) = self.ax.transData.transform([(x0, y0), (x1, y1)])
+        height, width = self.animation_pixels.shape[:2]
+        if abs(right - left - width) > 1 or abs(top - bottom - height) > 1:
+            return False
+        renderer = self.canvas.get_renderer()
+        gc = renderer.new_gc()
+        gc.set_clip_rectangle(self.ax.bbox)
+        renderer.draw_image(gc, round(left), round(bottom), self.animation_pixels)
+        gc.restore()
+        return True
 
     def plot_target_point(self,x,y):
-        if x > 6 or x < -6 or y > 10 or y < 0:
+        x0, x1, y0, y1 = self.extent
+        if x > x1 or x < x0 or y > y1 or y < y0:
+            self.hide_target_point()
+            return
+        self.target_marker.set_data([x], [y])
+        if not self.target_marker.get_visible() or self.legend is None:
+            self.target_marker.set_visible(True)
+            if self.legend is None:
+                self.legend = self.ax.legend(handles=[self.target_marker])
+            self.legend.set_visible(True)
+            self.canvas.draw()
+            return
+        self.blit_overlays()
+
+    def hide_target_point(self):
+        if not self.target_marker.get_visible():
+            return
+        self.target_marker.set_visible(False)
+        if self.legend is not None:
+            self.legend.set_visible(False)
+        self.canvas.draw()
+
+    def blit_overlays(self):
+        if self.background is None:
+            self.canvas.draw()
             return
-        self.ax.plot(x, y, 'g*', markersize=15, label='Target Point')
-        self.ax.legend()
-        self.canvas.draw()
\ No newline at end of file
+        self.canvas.restore_region(self.background)
+        self.draw_overlays()
+        self.canvas.blit(self.ax.bbox)
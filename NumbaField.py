@@ -0,0 +1,117 @@
+import importlib.util
+
+import numpy as np
+
+# Up to this alpha*R the decay exp(-alpha*R) is summed as a Taylor series to
+# the 5th power (off by < 1e-21), which unlike np.exp lets LLVM vectorize the
+# pixel loop; typical of acoustic scenes, where alpha is a few 1e-6 per meter
+SERIES_DECAY_MAX = 1e-3
+
+# Kernels by whether they take the series decay
+_kernels = {}
+
+
+def _compile(series):
+    # Numba is only imported and the kernel only compiled on first use.
+    # `series` is a compile-time constant: with the choice made inside the
+    # pixel loop instead, LLVM vectorizes neither branch.
+    import numba
+
+    # The kernel first runs on the compute worker's thread; TBB started from
+    # a thread other than the main one keeps the interpreter from exiting
+    numba.config.THREADING_LAYER_PRIORITY = ['omp', 'workqueue', 'tbb']
+
+    @numba.njit(parallel=True, cache=True)
+    def add_field(out, x, y, x_n, y_n, weights, turns_per_meter, alpha, multiples, table_cos, table_sin):
+        # out[i, j] += sum over harmonic groups g, multiples m and elements n
+        # of weights[row, n] * E**m / R, E = exp((2j*pi*turns_per_meter[g] - alpha[g]) * R),
+        # with row running through the groups' multiples in order. One grid
+        # row per iteration in float64 real and imaginary parts, pixel loops
+        # innermost so LLVM vectorizes them; E uses FieldEngine's phasor table.
+        eps = np.finfo(np.float64).eps
+        size = table_cos.shape[0]
+        scale = 2 * np.pi / size
+        nx = x.shape[0]
+        for i in numba.prange(y.shape[0]):
+            acc_re = np.zeros(nx)
+            acc_im = np.zeros(nx)
+            R = np.empty(nx)
+            inv = np.empty(nx)
+            s_re = np.empty(nx)
+            s_im = np.empty(nx)
+            b_re = np.empty(nx)
+            b_im = np.empty(nx)
+            for n in range(x_n.shape[0]):
+                dy = y[i] - y_n[n]
+                for j in range(nx):
+                    dx = x[j] - x_n[n]
+                    R[j] = np.sqrt(dx * dx + dy * dy)
+                    inv[j] = 1 / (R[j] + eps)
+                row = 0
+                for g in range(turns_per_meter.shape[0]):
+                    turns = turns_per_meter[g] * size
+                    a = alpha[g]
+                    for j in range(nx):
+                        t = R[j] * turns
+                        m = np.rint(t)
+                        t = (t - m) * scale
+                        index = np.int64(m) & (size - 1)
+                        d = a * R[j]
+                        if series:
+                            decay = 1 - d * (1 - d * (0.5 - d * (1 / 6 - d * (1 / 24 - d * (1 / 120)))))
+                        else:
+                            decay = np.exp(-d)
+                        c_re = (1 - 0.5 * t * t) * decay
+                        c_im = t * decay
+                        s_re[j] = table_cos[index] * c_re - table_sin[index] * c_im
+                        s_im[j] = table_cos[index] * c_im + table_sin[index] * c_re
+                        b_re[j] = s_re[j] * inv[j]
+                        b_im[j] = s_im[j] * inv[j]
+                    for k in range(multiples[g]):
+                        w_re = weights[row + k, n].real
+                        w_im = weights[row + k, n].imag
+                        if k > 0:
+                            for j in range(nx):
+                                re = b_re[j] * s_re[j] - b_im[j] * s_im[j]
+                                b_im[j] = b_re[j] * s_im[j] + b_im[j] * s_re[j]
+                                b_re[j] = re
+                        if w_re != 0 or w_im != 0:
+                            for j in range(nx):
+                                acc_re[j] += w_re * b_re[j] - w_im * b_im[j]
+                                acc_im[j] += w_re * b_im[j] + w_im * b_re[j]
+                    row += multiples[g]
+            for j in range(nx):
+                out[i, j] += complex(acc_re[j], acc_im[j])
+
+    return add_field
+
+
+def installed():
+    # Whether Numba can be imported, without importing it
+    return importlib.util.find_spec('numba') is not None
+
+
+def add_field(field, x, y, x_n, y_n, groups, c):
+    # Adds the element sum of FieldEngine.harmonic_groups `groups` to
+    # `field` in place; `field` may be complex64 or complex128
+    from FieldEngine import _PHASOR_COS, _PHASOR_SIN
+
+    if field.size == 0:
+        return
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    x_n, y_n = np.asarray(x_n, dtype=float), np.asarray(y_n, dtype=float)
+    # The farthest pixel from any element is a corner of the grid
+    R_max = max(float(np.max(np.hypot(cx - x_n, cy - y_n))) for cx in (x[0], x[-1]) for cy in (y[0], y[-1]))
+    for series in (True, False):
+        part = [(frequency, group) for frequency, group in groups
+                if (frequency / (1e6 * c) * R_max <= SERIES_DECAY_MAX) == series]
+        if not part:
+            continue
+        if series not in _kernels:
+            _kernels[series] = _compile(series)
+        frequencies = np.array([frequency for frequency, _ in part], dtype=float)
+        weights = np.array([np.zeros(len(x_n)) if w is None else w for _, group in part for w in group],
+                           dtype=complex)
+        multiples = np.array([len(group) for _, group in part], dtype=np.int64)
+        _kernels[series](field, x, y, x_n, y_n, weights, frequencies / c, frequencies / (1e6 * c), multiples,
+                         _PHASOR_COS, _PHASOR_SIN)
@@ -0,0 +1,33 @@
+import importlib.util
+
+import numpy as np
+
+
+def installed():
+    # Whether numexpr can be imported, without importing it
+    return importlib.util.find_spec('numexpr') is not None
+
+
+def add_field(field, x, y, x_n, y_n, weights, frequencies, c):
+    """Adds the element sum of every component (rows of `weights`) to `field`.
+
+    One fused, multi-threaded numexpr pass per element and component:
+    w * exp((jk - alpha) * R) / R is accumulated in place without the
+    intermediate arrays NumPy would build. numexpr has no complex64, so a
+    single-precision field is summed in complex128 and added at the end.
+    """
+    import numexpr
+
+    X = np.asarray(x, dtype=float)[None, :]
+    Y = np.asarray(y, dtype=float)[:, None]
+    out = field if field.dtype == np.complex128 else np.zeros(field.shape, dtype=np.complex128)
+    eps = np.finfo(float).eps
+    decay = [complex(-f / (1e6 * c), 2 * np.pi * f / c) for f in frequencies]  # -alpha + jk
+    for n in range(len(x_n)):
+        R = numexpr.evaluate('sqrt((X - xn)**2 + (Y - yn)**2)',
+                             local_dict={'X': X, 'Y': Y, 'xn': x_n[n], 'yn': y_n[n]})
+        for s, w in zip(decay, weights):
+            numexpr.evaluate('out + w * exp(s * R) / (R + eps)', out=out,
+                             local_dict={'out': out, 'w': complex(w[n]), 's': s, 'R': R, 'eps': eps})
+    if out is not field:
+        field += out
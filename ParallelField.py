@@ -0,0 +1,112 @@
+import atexit
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context, shared_memory
+
+import numpy as np
+
+from FieldEngine import PRECISIONS
+
+# Row tiles handed out per worker, so a scene with fewer arrays than cores
+# still keeps every core busy
+TILES_PER_WORKER = 2
+
+# Workers are forked from a server that has only imported the physics core,
+# so they start in milliseconds and never load Qt, matplotlib or the GUI's
+# __main__. Platforms without forkserver fall back to spawn.
+CORE_MODULES = ['numpy', 'Array', 'FarField', 'FieldEngine', 'NumbaField', 'PatternEngine', 'ParallelField']
+
+_executor = None
+_executor_workers = None
+
+
+def _mp_context():
+    if 'forkserver' in get_all_start_methods():
+        context = get_context('forkserver')
+        context.set_forkserver_preload(CORE_MODULES)
+        return context
+    return get_context('spawn')
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def get_executor(workers=None):
+    # The pool is kept alive between calls; process start-up is paid once
+    global _executor, _executor_workers
+    workers = workers or default_workers()
+    if _executor is None or _executor_workers != workers:
+        shutdown_executor()
+        _executor = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context())
+        _executor_workers = workers
+    return _executor
+
+
+def shutdown_executor():
+    global _executor, _executor_workers
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+    _executor = None
+    _executor_workers = None
+
+
+atexit.register(shutdown_executor)
+
+
+def _compute_tile(shm_name, shape, dtype, method, index, array, x, y, row_start, row_stop, options):
+    # Workers share the parent's resource tracker, so attaching here does
+    # not take ownership; the parent unlinks the block
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        calculate = getattr(array, method)
+        out[index, row_start:row_stop] = calculate(x, y[row_start:row_stop], **options)
+        del out
+    finally:
+        shm.close()
+
+
+def calculate_fields(arrays, x, y, workers=None, precision='double', far_field_tolerance=None, backend='numpy'):
+    """`calculate_field` of every array, spread over a process pool.
+
+    Each array is split into row tiles; workers write their tiles straight
+    into one shared-memory block instead of pickling results back.
+    """
+    options = {'precision': precision, 'far_field_tolerance': far_field_tolerance, 'backend': backend}
+    return _calculate(arrays, x, y, workers, options, 'calculate_field', PRECISIONS[precision][0])
+
+
+def calculate_complex_fields(arrays, x, y, workers=None, precision='double', far_field_tolerance=None,
+                             backend='numpy'):
+    # As calculate_fields, but the linear complex fields
+    options = {'precision': precision, 'far_field_tolerance': far_field_tolerance, 'backend': backend}
+    return _calculate(arrays, x, y, workers, options, 'calculate_complex_field', PRECISIONS[precision][1])
+
+
+def _calculate(arrays, x, y, workers, options, method, dtype):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(arrays) == 0:
+        return []
+    workers = workers or default_workers()
+    shape = (len(arrays), len(y), len(x))
+    tiles = max(1, min(len(y), math.ceil(workers * TILES_PER_WORKER / len(arrays))))
+    bounds = np.linspace(0, len(y), tiles + 1).astype(int)
+    shm = shared_memory.SharedMemory(create=True, size=max(math.prod(shape) * np.dtype(dtype).itemsize, 1))
+    try:
+        executor = get_executor(workers)
+        futures = [
+            executor.submit(_compute_tile, shm.name, shape, dtype, method, i, array, x, y, start, stop, options)
+            for i, array in enumerate(arrays)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+            if stop > start
+        ]
+        for future in futures:
+            future.result()
+        fields = np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return list(fields)
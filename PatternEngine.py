@@ -0,0 +1,78 @@
+import numpy as np
+
+# Below this |sin(psi/2)| the Dirichlet ratio loses precision, so dirichlet
+# takes its limit there instead
+SINGULAR_TOL = 1e-6
+# Samples of a dense pattern
+DENSE_ANGLES = 32768
+
+
+def _component_columns(array):
+    freq = np.array([comp.frequency for comp in array.components], dtype=float)[:, None]
+    phase = np.array([comp.phase for comp in array.components], dtype=float)[:, None]
+    amplitude = np.array([comp.amplitude for comp in array.components], dtype=float)[:, None]
+    return freq, phase, amplitude
+
+
+def dirichlet(half, N):
+    # sin(N*h)/sin(h) for broadcastable h and N. Near the 0/0 points the
+    # L'Hopital limit N*cos(N*h)/cos(h) is used; with SINGULAR_TOL its
+    # error stays below ~(N*SINGULAR_TOL)**2 relative.
+    den = np.sin(half)
+    singular = np.abs(den) < SINGULAR_TOL
+    num = np.where(singular, N * np.cos(N * half), np.sin(N * half))
+    return num / np.where(singular, np.cos(half), den)
+
+
+def array_factor(array, theta):
+    """Complex array factor of a uniform linear array at angles `theta`.
+
+    Each component's element sum is the geometric series
+    sum_n exp(j*n*psi) = exp(j*(N-1)*psi/2) * sin(N*psi/2) / sin(psi/2),
+    evaluated for all components and angles at once with dirichlet, so the
+    cost does not depend on the number of elements.
+    """
+    theta = np.asarray(theta, dtype=float)
+    af = np.zeros(theta.shape, dtype=complex)
+    if len(array.components) == 0:
+        return af
+    freq, phase, amplitude = _component_columns(array)
+    N = array.num_elements
+    k = 2 * np.pi * freq / array.c
+    d = array.spacing  # spacing in meters
+    psi = k * d * (np.cos(theta.ravel()) - np.sin(np.radians(array.steering_angle)))
+    half = psi / 2
+    component_af = amplitude * np.exp(1j * ((N - 1) * half + phase)) * dirichlet(half, N)
+    return component_af.sum(axis=0).reshape(theta.shape)
+
+
+def dense_angles(theta_start=0.0, theta_stop=-np.pi, num=DENSE_ANGLES):
+    """`num` angles between theta_start and theta_stop, evenly spaced in u = cos(theta).
+
+    The element phase step is linear in u and every lobe has the same
+    width in u, so nulls and sidelobes are resolved evenly across the
+    pattern, and a narrow window zooms in at the same sample count. With
+    array_factor's closed form the cost is O(num), whatever the number of
+    elements. Returned increasing, in the widget's [-pi, 0] convention.
+    """
+    u_start, u_stop = sorted((np.cos(theta_start), np.cos(theta_stop)))
+    return -np.arccos(np.linspace(u_start, u_stop, num))
+
+
+def main_lobe_angle(array):
+    # Steering direction in the pattern's theta convention (cos(theta) = sin(steering))
+    return -np.arccos(np.clip(np.sin(np.radians(array.steering_angle)), -1, 1))
+
+
+def reference_array_factor(array, theta):
+    # Original per-element loop; kept as the ground truth for the closed form
+    af = np.zeros_like(theta, dtype=complex)
+    for comp in array.components:
+        k = 2 * np.pi * comp.frequency / array.c
+        d = array.spacing
+        psi = k * d * (np.cos(theta) - np.sin(np.radians(array.steering_angle)))
+        component_af = np.zeros_like(theta, dtype=complex)
+        for n in range(array.num_elements):
+            component_af += comp.amplitude * np.exp(1j * (n * psi + comp.phase))
+        af += component_af
+    return af
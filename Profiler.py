@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Spans kept for export; the percentiles use the newest WINDOW of each name
+MAX_SPANS = 20000
+WINDOW = 200
+
+
+class Profiler:
+    """Collects named timing spans from any thread.
+
+    Spans are (name, start, duration, thread, args) with times in seconds
+    from `time.perf_counter`. They can be summarised as p50/p95 per name or
+    exported as plain JSON or as a Chrome trace (chrome://tracing, Perfetto).
+    """
+    def __init__(self, max_spans=MAX_SPANS, window=WINDOW):
+        self.enabled = True
+        self.window = window
+        self._spans = deque(maxlen=max_spans)
+        self._recent = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), **args)
+
+    def record(self, name, start, end, **args):
+        # For stages that do not fit a with-block, e.g. a request and the
+        # signal that answers it
+        if not self.enabled:
+            return
+        span = (name, start, end - start, threading.get_ident(), args)
+        with self._lock:
+            self._spans.append(span)
+            recent = self._recent.get(name)
+            if recent is None:
+                recent = self._recent[name] = deque(maxlen=self.window)
+            recent.append(end - start)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+            self._recent.clear()
+
+    def stats(self):
+        # {name: {"count", "p50", "p95"}} over each name's recent window, in seconds
+        with self._lock:
+            recent = {name: list(durations) for name, durations in self._recent.items()}
+        return {name: {"count": len(durations),
+                       "p50": float(np.percentile(durations, 50)),
+                       "p95": float(np.percentile(durations, 95))}
+                for name, durations in recent.items() if durations}
+
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    def export_json(self, path):
+        spans = [{"name": name, "start": start - self._origin, "duration": duration,
+                  "thread": thread, "args": args}
+                 for name, start, duration, thread, args in self.spans()]
+        with open(path, 'w') as file:
+            json.dump({"spans": spans, "stats": self.stats()}, file, indent=4, default=str)
+
+    def export_chrome_trace(self, path):
+        # Complete ("X") events in microseconds
+        pid = os.getpid()
+        events = [{"name": name, "ph": "X", "ts": (start - self._origin) * 1e6, "dur": duration * 1e6,
+                   "pid": pid, "tid": thread, "args": args}
+                  for name, start, duration, thread, args in self.spans()]
+        with open(path, 'w') as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, default=str)
+
+
+# Shared by the GUI and the compute worker
+profiler = Profiler()
+span = profiler.span
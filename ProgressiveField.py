@@ -0,0 +1,73 @@
+import numpy as np
+
+# The preview takes the densest power-of-two sublattice with at most this
+# many samples, e.g. 50x50 of a 200x200 grid
+DEFAULT_PREVIEW_SAMPLES = 2500
+# Extra 2x refinements computed after full resolution while nothing changes
+DEFAULT_IDLE_LEVELS = 1
+
+
+def refine_axis(v):
+    # Doubles the sampling of an axis; the original samples stay at the even
+    # indices so an already computed grid nests inside the refined one
+    out = np.empty(2 * len(v) - 1)
+    out[::2] = v
+    out[1::2] = (v[:-1] + v[1:]) / 2
+    return out
+
+
+def preview_stride(nx, ny, samples=DEFAULT_PREVIEW_SAMPLES):
+    # Smallest power-of-two stride (sublattices only nest for those) whose
+    # sublattice of an nx x ny grid has at most `samples` points
+    stride = 1
+    while -(-nx // stride) * -(-ny // stride) > samples and stride < max(nx, ny):
+        stride *= 2
+    return stride
+
+
+def progressive_passes(compute, x, y, preview_samples=DEFAULT_PREVIEW_SAMPLES,
+                       idle_levels=DEFAULT_IDLE_LEVELS, max_shape=None):
+    """Yields (x, y, field) from a coarse preview up to full resolution and beyond.
+
+    `compute(x, y)` evaluates the field on a tensor grid and may return None
+    to abort. The preview is the sublattice of the full grid picked by
+    preview_stride; every later pass only computes the sublattices it is
+    missing, so no sample is evaluated twice. Past full resolution each idle
+    level halves the spacing, again reusing every existing sample, as long
+    as the result stays within `max_shape` (nx, ny), e.g. the pixels shown.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    stride = preview_stride(len(x), len(y), preview_samples)
+    preview = compute(x[::stride], y[::stride])
+    if preview is None:
+        return
+    # Keeps the precision `compute` works in
+    field = np.empty((len(y), len(x)), dtype=preview.dtype)
+    field[::stride, ::stride] = preview
+    yield x[::stride], y[::stride], field[::stride, ::stride].copy()
+    while stride > 1:
+        half = stride // 2
+        for i, j in ((0, half), (half, 0), (half, half)):
+            part = compute(x[j::stride], y[i::stride])
+            if part is None:
+                return
+            field[i::stride, j::stride] = part
+        stride = half
+        yield x[::stride], y[::stride], field[::stride, ::stride].copy()
+    for _ in range(idle_levels):
+        if max_shape is not None and (2 * len(x) - 1 > max_shape[0] or 2 * len(y) - 1 > max_shape[1]):
+            return
+        fine_x, fine_y = refine_axis(x), refine_axis(y)
+        fine = np.empty((len(fine_y), len(fine_x)), dtype=field.dtype)
+        fine[::2, ::2] = field
+        columns = compute(fine_x[1::2], y)
+        if columns is None:
+            return
+        fine[::2, 1::2] = columns
+        rows = compute(fine_x, fine_y[1::2])
+        if rows is None:
+            return
+        fine[1::2, :] = rows
+        x, y, field = fine_x, fine_y, fine
+        yield x, y, field.copy()
@@ -0,0 +1,56 @@
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+
+DEFAULT_FPS = 60
+
+
+class RenderScheduler(QObject):
+    """Coalesces render requests into at most one render per display frame.
+
+    `request()` only marks the view dirty; the render callback runs once on
+    the next frame tick and reads whatever the state is at that moment, so a
+    burst of slider events collapses into a single render of the latest
+    values. Requests raised by the render itself are folded into it.
+    """
+    def __init__(self, render, fps=None, parent=None):
+        super().__init__(parent)
+        self.render = render
+        self.requested = 0
+        self.executed = 0
+        self._dirty = False
+        self._rendering = False
+        if fps is None:
+            screen = QApplication.primaryScreen()
+            fps = screen.refreshRate() if screen is not None and screen.refreshRate() > 0 else DEFAULT_FPS
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(int(1000 / fps))
+        self.timer.timeout.connect(self.flush)
+
+    def request(self):
+        self.requested += 1
+        if self._rendering:
+            return
+        self._dirty = True
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        # Run a pending render now instead of waiting for the frame tick
+        self.timer.stop()
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._rendering = True
+        try:
+            self.render()
+        finally:
+            self._rendering = False
+        self.executed += 1
+
+    def stats(self):
+        return {
+            "requested": self.requested,
+            "executed": self.executed,
+            "coalesced": self.requested - self.executed,
+        }
@@ -0,0 +1,61 @@
+import json
+
+from Array import Array, FrequencyComponent
+
+
+def array_from_dict(array_data):
+    array = Array(
+        center=array_data["center"],
+        num_elements=array_data["num_elements"],
+        spacing=array_data["spacing"],
+        curvature=array_data["curvature"],
+        rotation=array_data["rotation"],
+        type=array_data["type"]
+    )
+    array.set_steering_angle(array_data["steering_angle"])
+    array.components = [FrequencyComponent(**comp) for comp in array_data["frequencies"]]
+    return array
+
+
+def array_to_dict(array):
+    return {
+        "center": array.center.tolist(),
+        "num_elements": array.num_elements,
+        "spacing": array.spacing,
+        "curvature": array.curvature,
+        "rotation": array.rotation,
+        "steering_angle": array.steering_angle,
+        "type": array.type,
+        "frequencies": [
+            {
+             "frequency":comp.frequency,
+             "phase":comp.phase,
+             "amplitude":comp.amplitude
+            }
+            for comp in array.components
+        ]
+    }
+
+
+def load_scenario(path):
+    # Returns {"arrays": [Array, ...], "target": (x, y), "follow_target": bool}
+    with open(path, 'r') as file:
+        scenario = json.load(file)
+    return {
+        "arrays": [array_from_dict(array_data) for array_data in scenario["arrays"]],
+        "target": (scenario["target"]["x"], scenario["target"]["y"]),
+        "follow_target": scenario["follow_target"],
+    }
+
+
+def save_scenario(path, arrays, target, follow_target):
+    scenario = {
+        "arrays": [array_to_dict(array) for array in arrays],
+        "target": {
+            "x": target[0],
+            "y": target[1]
+        },
+        "follow_target": follow_target
+    }
+    with open(path, 'w') as file:
+        json.dump(scenario, file, indent=4)
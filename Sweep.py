@@ -0,0 +1,143 @@
+import time
+
+import numpy as np
+
+from Array import FrequencyComponent
+from FieldEngine import _propagation, element_layout, steering_weights
+from PatternEngine import dirichlet
+
+# Samples (parameter points x angles, or x elements) evaluated per chunk
+DEFAULT_CHUNK_POINTS = 1 << 20
+
+AXES = ('steering_angle', 'frequency', 'spacing', 'num_elements')
+
+
+class SweepResult:
+    """N-D sweep output with named dimensions and their coordinates."""
+    def __init__(self, values, dims, coords, elapsed):
+        self.values = values
+        self.dims = dims
+        self.coords = coords
+        self.elapsed = elapsed
+
+    @property
+    def points_per_second(self):
+        return self.values.size / self.elapsed if self.elapsed > 0 else float('inf')
+
+    def __repr__(self):
+        shape = ', '.join(f"{dim}: {n}" for dim, n in zip(self.dims, self.values.shape))
+        return f"SweepResult({shape}; {self.points_per_second:.3g} points/s)"
+
+
+def _axes(array, steering_angle, frequency, spacing, num_elements):
+    # Axes that are not swept are length 1 and hold the array's own value.
+    # A swept frequency replaces the array's components with one tone that
+    # keeps the first component's amplitude and phase; otherwise all
+    # components are summed and the frequency coordinate is NaN when there
+    # is more than one of them.
+    components = array.components if array.components else [FrequencyComponent(amplitude=0.0)]
+    tones = np.array([[comp.frequency, comp.amplitude, comp.phase] for comp in components])
+    swept_frequency = frequency is not None
+    if swept_frequency:
+        tones = tones[:1]
+    elif len(tones) > 1:
+        frequency = np.nan
+    else:
+        frequency = tones[0, 0]
+    values = {
+        'steering_angle': array.steering_angle if steering_angle is None else steering_angle,
+        'frequency': frequency,
+        'spacing': array.spacing if spacing is None else spacing,
+        'num_elements': array.num_elements if num_elements is None else num_elements,
+    }
+    coords = {name: np.atleast_1d(np.asarray(values[name], dtype=int if name == 'num_elements' else float))
+              for name in AXES}
+    return coords, tones, swept_frequency
+
+
+def _parameter_block(coords, tones, swept_frequency, flat):
+    # Parameter values at the flat grid indices `flat`, shaped (P, 1, 1) with
+    # frequency shaped (P, C, 1) against the component axis
+    index = np.unravel_index(flat, tuple(len(coords[name]) for name in AXES))
+    steer, freq, spacing, num_elements = (coords[name][i][:, None, None] for name, i in zip(AXES, index))
+    if not swept_frequency:
+        freq = tones[:, 0][None, :, None]
+    return steer, freq, spacing, num_elements
+
+
+def _run(total, values, inner, chunk_points, evaluate, out, progress):
+    # `values` output values and `inner` samples per parameter point; chunks
+    # are sized by samples, progress is reported in output values per second
+    # like SweepResult.points_per_second
+    start = time.perf_counter()
+    block = max(1, chunk_points // max(inner, 1))
+    for first in range(0, total, block):
+        done = min(first + block, total)
+        out[first:done] = evaluate(np.arange(first, done))
+        if progress is not None:
+            elapsed = time.perf_counter() - start
+            progress(done, total, done * values / elapsed if elapsed > 0 else float('inf'))
+    return time.perf_counter() - start
+
+
+def sweep_beam_pattern(array, theta, steering_angle=None, frequency=None, spacing=None,
+                       num_elements=None, chunk_points=DEFAULT_CHUNK_POINTS, progress=None):
+    """Beam pattern in dB, as `calculate_beam_pattern`, over a parameter grid.
+
+    Returns a SweepResult with dims (steering_angle, frequency, spacing,
+    num_elements, theta). Every chunk of parameter points is one broadcast
+    closed-form evaluation; `progress(done, total, points_per_second)` is
+    called after each chunk, in the unit of SweepResult.points_per_second.
+    """
+    theta = np.atleast_1d(np.asarray(theta, dtype=float))
+    coords, tones, swept_frequency = _axes(array, steering_angle, frequency, spacing, num_elements)
+    grid_shape = tuple(len(coords[name]) for name in AXES)
+    total = int(np.prod(grid_shape))
+    cos_theta = np.cos(theta)[None, None, :]
+    amplitude = tones[:, 1][None, :, None]
+    phase = tones[:, 2][None, :, None]
+
+    def evaluate(flat):
+        steer, freq, d, N = _parameter_block(coords, tones, swept_frequency, flat)
+        k = 2 * np.pi * freq / array.c
+        psi = k * d * (cos_theta - np.sin(np.radians(steer)))
+        half = psi / 2
+        af = (amplitude * np.exp(1j * ((N - 1) * half + phase)) * dirichlet(half, N)).sum(axis=1)
+        return 20 * np.log10(np.abs(af) / N[:, 0])
+
+    out = np.empty((total, len(theta)))
+    elapsed = _run(total, len(theta), len(theta) * len(tones), chunk_points, evaluate, out, progress)
+    dims = AXES + ('theta',)
+    coords['theta'] = theta
+    return SweepResult(out.reshape(grid_shape + (len(theta),)), dims, coords, elapsed)
+
+
+def sweep_target_level(array, target, steering_angle=None, frequency=None, spacing=None,
+                       num_elements=None, chunk_points=DEFAULT_CHUNK_POINTS, progress=None):
+    """Field level in dB at `target` (x, y), as `calculate_field`, over a parameter grid.
+
+    Returns a SweepResult with dims (steering_angle, frequency, spacing,
+    num_elements). Elements are broadcast up to the largest element count
+    and masked per point, keeping the array's center, curvature and rotation;
+    positions, weights and propagation are FieldEngine's. `progress` is
+    called as in sweep_beam_pattern.
+    """
+    coords, tones, swept_frequency = _axes(array, steering_angle, frequency, spacing, num_elements)
+    grid_shape = tuple(len(coords[name]) for name in AXES)
+    total = int(np.prod(grid_shape))
+    n = np.arange(int(coords['num_elements'].max()))[None, None, :]
+    amplitude = tones[:, 1][None, :, None]
+    phase = tones[:, 2][None, :, None]
+
+    def evaluate(flat):
+        steer, freq, d, N = _parameter_block(coords, tones, swept_frequency, flat)
+        x_n, y_n = element_layout(n, N, d, array.curvature, array.rotation, array.center)
+        R = np.hypot(target[0] - x_n, target[1] - y_n)
+        w = steering_weights(n, freq, array.c, d, steer, amplitude, phase)
+        terms = w * _propagation(R, freq, array.c, 1 / (R + np.finfo(float).eps))
+        terms = np.where(n < N, terms, 0)
+        return 20 * np.log10(np.abs(terms.sum(axis=(1, 2))))
+
+    out = np.empty(total)
+    elapsed = _run(total, 1, len(tones) * n.size, chunk_points, evaluate, out, progress)
+    return SweepResult(out.reshape(grid_shape), AXES, coords, elapsed)
@@ -0,0 +1,157 @@
+import math
+import struct
+import zlib
+
+import numpy as np
+
+from FieldEngine import PRECISIONS, scene_field
+
+# Working memory the evaluator may use on top of the interpreter and libraries
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Peak bytes per tile pixel of `scene_field`, as
+# measured with tracemalloc (192 and 104), plus some headroom
+BYTES_PER_PIXEL = {'double': 224, 'single': 128}
+MIN_TILE = 16
+COLORMAP_LEVELS = 256
+
+
+def tile_size(nx, memory_budget=DEFAULT_MEMORY_BUDGET, precision='double'):
+    # Side s of square tiles such that one tile's temporaries plus the
+    # mapped output band (s rows of the full width) fit in the budget
+    itemsize = np.dtype(PRECISIONS[precision][0]).itemsize
+    a, b = BYTES_PER_PIXEL[precision], nx * itemsize
+    s = int((-b + math.sqrt(b * b + 4 * a * memory_budget)) / (2 * a))
+    if s < MIN_TILE:
+        raise ValueError(f"Memory budget of {memory_budget} bytes is too small for a {nx} wide grid")
+    return s
+
+
+def _band(path, dtype, offset, width, row_start, row_stop, mode='r+'):
+    # Maps only rows [row_start, row_stop); dropping the map releases its
+    # pages, so resident memory does not grow with the file
+    itemsize = np.dtype(dtype).itemsize
+    return np.memmap(path, dtype=dtype, mode=mode, offset=offset + row_start * width * itemsize,
+                     shape=(row_stop - row_start, width))
+
+
+def tiled_field(arrays, x, y, path, memory_budget=DEFAULT_MEMORY_BUDGET, precision='double',
+                tile=None, progress=None, mode='coherent', far_field_tolerance=None, backend='numpy'):
+    """`FieldEngine.scene_field` of `arrays`, evaluated tile by tile into a .npy file.
+
+    The output is created with np.lib.format.open_memmap and written one
+    band of tiles at a time, so peak memory is set by `memory_budget` (or
+    an explicit square `tile` side), not by the grid size. `progress(done,
+    total)` is called after each tile. Returns (path, (vmin, vmax)) with the
+    finite range of the map, as needed for colormapping.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    real = PRECISIONS[precision][0]
+    nx, ny = len(x), len(y)
+    tile = tile or tile_size(nx, memory_budget, precision)
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=real, shape=(ny, nx))
+    offset = out.offset
+    del out
+    rows = range(0, ny, tile)
+    cols = range(0, nx, tile)
+    total = len(rows) * len(cols)
+    done = 0
+    vmin, vmax = np.inf, -np.inf
+    for r0 in rows:
+        r1 = min(r0 + tile, ny)
+        band = _band(path, real, offset, nx, r0, r1)
+        for c0 in cols:
+            c1 = min(c0 + tile, nx)
+            field = scene_field(arrays, x[c0:c1], y[r0:r1], mode, precision=precision,
+                                far_field_tolerance=far_field_tolerance, backend=backend)
+            band[:, c0:c1] = field
+            vmin, vmax = _finite_range(field, vmin, vmax)
+            del field
+            done += 1
+            if progress is not None:
+                progress(done, total)
+        band.flush()
+        del band
+    return path, (vmin, vmax)
+
+
+def colormap_lut(cmap='jet'):
+    # RGB table of the colormap; matplotlib is only needed for this
+    from matplotlib import colormaps
+
+    return (colormaps[cmap](np.linspace(0, 1, COLORMAP_LEVELS))[:, :3] * 255).round().astype(np.uint8)
+
+
+def _png_chunk(tag, data):
+    return (struct.pack('>I', len(data)) + tag + data
+            + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+
+def write_field_png(field_path, png_path, vrange=None, cmap='jet', memory_budget=DEFAULT_MEMORY_BUDGET):
+    """Colormaps a .npy field into an RGB PNG, one band of rows at a time.
+
+    Like the GUI map, the lowest y is at the bottom and the colour scale
+    spans the map's finite range unless `vrange` is given. The PNG is
+    streamed through zlib, so the full image never exists in memory.
+    """
+    field = np.load(field_path, mmap_mode='r')
+    ny, nx = field.shape
+    dtype, offset = field.dtype, field.offset
+    del field
+    if vrange is None:
+        vrange = field_range(field_path, memory_budget)
+    vmin, vmax = vrange
+    scale = (COLORMAP_LEVELS - 1) / (vmax - vmin) if vmax > vmin else 0.0
+    lut = colormap_lut(cmap)
+    # Per pixel: the mapped input, a float32 working copy, the index, and
+    # the RGB row buffer with its bytes and compressed copies
+    band_rows = max(1, memory_budget // (nx * (dtype.itemsize + 24)))
+    compressor = zlib.compressobj(6)
+    with open(png_path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', nx, ny, 8, 2, 0, 0, 0)))
+        # PNG rows run top to bottom, so the bands are walked from the top of the map
+        for r1 in range(ny, 0, -band_rows):
+            r0 = max(0, r1 - band_rows)
+            band = _band(field_path, dtype, offset, nx, r0, r1, mode='r')
+            values = np.array(band[::-1], dtype=np.float32)
+            del band
+            np.nan_to_num(values, copy=False, nan=vmin, posinf=vmax, neginf=vmin)
+            values -= vmin
+            values *= scale
+            np.clip(values, 0, COLORMAP_LEVELS - 1, out=values)
+            index = values.astype(np.uint8)
+            del values
+            rgb = np.empty((r1 - r0, 1 + 3 * nx), dtype=np.uint8)
+            rgb[:, 0] = 0  # no PNG row filter
+            rgb[:, 1:] = lut[index].reshape(r1 - r0, 3 * nx)
+            data = compressor.compress(rgb.tobytes())
+            if data:
+                file.write(_png_chunk(b'IDAT', data))
+        file.write(_png_chunk(b'IDAT', compressor.flush()))
+        file.write(_png_chunk(b'IEND', b''))
+    return png_path
+
+
+def field_range(field_path, memory_budget=DEFAULT_MEMORY_BUDGET):
+    # Finite (min, max) of a .npy field, read one band at a time
+    field = np.load(field_path, mmap_mode='r')
+    ny, nx = field.shape
+    dtype, offset = field.dtype, field.offset
+    del field
+    band_rows = max(1, memory_budget // (nx * (dtype.itemsize + 1)))
+    vmin, vmax = np.inf, -np.inf
+    for r0 in range(0, ny, band_rows):
+        band = _band(field_path, dtype, offset, nx, r0, min(r0 + band_rows, ny), mode='r')
+        vmin, vmax = _finite_range(band, vmin, vmax)
+        del band
+    return vmin, vmax
+
+
+def _finite_range(values, vmin, vmax):
+    # Running (min, max) over the finite entries, without copying them out
+    finite = np.isfinite(values)
+    vmin = min(vmin, float(np.min(values, where=finite, initial=np.inf)))
+    vmax = max(vmax, float(np.max(values, where=finite, initial=-np.inf)))
+    return vmin, vmax
@@ -0,0 +1,105 @@
+import copy
+
+import numpy as np
+
+# Display time for one cycle of the highest frequency; lower frequencies
+# keep their ratio to it
+DEFAULT_PERIOD = 1.0
+# Colour range: this percentile of the envelope, so the 1/R peaks at the
+# elements do not wash out the wave fronts
+LEVEL_PERCENTILE = 99
+
+
+def frequency_parts(array):
+    # [(frequency, copy of `array` with only that frequency's components)]
+    parts = {}
+    for comp in array.components:
+        parts.setdefault(float(comp.frequency), []).append(comp)
+    result = []
+    for frequency, components in parts.items():
+        part = copy.copy(array)
+        part.components = components
+        result.append((frequency, part))
+    return result
+
+
+def harmonic_fields(arrays, x, y, calculate):
+    """Scene field split by frequency, [(frequency, complex field)].
+
+    The map's complex field adds every component as a phasor at t = 0; in
+    time each frequency turns at its own rate, so the instantaneous field
+    needs them apart. Frequencies shared by several arrays add coherently;
+    arrays combined incoherently have no instantaneous field to split.
+    `calculate(array, x, y)` gives one array's complex field, e.g.
+    FieldCache.field, so the parts are cached like any other field.
+    """
+    fields = {}
+    for array in arrays:
+        for frequency, part in frequency_parts(array):
+            field = calculate(part, x, y)
+            fields[frequency] = field if frequency not in fields else fields[frequency] + field
+    return sorted(fields.items())
+
+
+class WaveAnimation:
+    """Instantaneous field Re{sum_f F_f exp(-2j*pi*f*t)} from complex fields.
+
+    The basis is exp(+jkR), so exp(-j*omega*t) makes the fronts move away
+    from the elements. Time is scaled so the highest frequency completes a
+    cycle every `period` seconds. A frame is two multiply-adds per
+    frequency on float32 copies of the real and imaginary parts, written
+    into one reused buffer; no field is recomputed. With an RGB `lut`
+    (e.g. TiledField.colormap_lut) pixels() colours frames directly.
+    """
+    def __init__(self, harmonics, period=DEFAULT_PERIOD, lut=None):
+        if len(harmonics) == 0:
+            raise ValueError("No fields to animate")
+        f_max = max(frequency for frequency, _ in harmonics)
+        self.parts = [(frequency / (f_max * period),
+                       np.ascontiguousarray(field.real, dtype=np.float32),
+                       np.ascontiguousarray(field.imag, dtype=np.float32))
+                      for frequency, field in harmonics]
+        shape = self.parts[0][1].shape
+        self.out = np.empty(shape, dtype=np.float32)
+        self._scratch = np.empty(shape, dtype=np.float32)
+        envelope = np.zeros(shape, dtype=np.float32)
+        for _, field in harmonics:
+            envelope += np.abs(field).astype(np.float32)
+        level = float(np.percentile(envelope, LEVEL_PERCENTILE))
+        self.level = level if level > 0 else 1.0
+        self._lut = None
+        if lut is not None:
+            rgba = np.empty((len(lut), 4), dtype=np.uint8)
+            rgba[:, :3] = lut
+            rgba[:, 3] = 255
+            # One uint32 per pixel, so colouring is a single take
+            self._lut = rgba.view(np.uint32).ravel()
+            self._index = np.empty(shape, dtype=np.uint8)
+            self._pixels = np.empty(shape, dtype=np.uint32)
+
+    def frame(self, t):
+        # Re{F exp(-j*phi)} = F.real*cos(phi) + F.imag*sin(phi)
+        out, scratch = self.out, self._scratch
+        for i, (rate, re, im) in enumerate(self.parts):
+            phi = 2 * np.pi * ((rate * t) % 1.0)
+            np.multiply(re, np.float32(np.cos(phi)), out=out if i == 0 else scratch)
+            if i > 0:
+                out += scratch
+            np.multiply(im, np.float32(np.sin(phi)), out=scratch)
+            out += scratch
+        return out
+
+    def pixels(self, t):
+        # frame(t) through the lut over [-level, level], as RGBA with the
+        # lowest y first, the way Agg's draw_image takes it; without a lut
+        # just frame(t)
+        frame = self.frame(t)
+        if self._lut is None:
+            return frame
+        scratch = self._scratch
+        np.multiply(frame, np.float32((len(self._lut) - 1) / (2 * self.level)), out=scratch)
+        scratch += np.float32((len(self._lut) - 1) / 2)
+        np.clip(scratch, 0, len(self._lut) - 1, out=scratch)
+        np.copyto(self._index, scratch, casting='unsafe')
+        np.take(self._lut, self._index, out=self._pixels)
+        return self._pixels.view(np.uint8).reshape(self._pixels.shape + (4,))
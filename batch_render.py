@@ -0,0 +1,198 @@
+"""Render scenario files to .npy/.png without starting the GUI.
+
+    python batch_render.py                       # every scenarios/*.json
+    python batch_render.py scenarios/5G.json --size 800 --format png --out renders
+    python batch_render.py scenarios/canser.json --size 8000 --tiled --memory 512
+
+With --tiled the map is evaluated tile by tile into a memory-mapped .npy
+and colormapped band by band into a full-resolution PNG (no axes), so
+memory stays within --memory MB whatever the size.
+"""
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import BackendSelection
+import FieldEngine
+import ParallelField
+import Scenario
+import TiledField
+
+DEFAULT_SIZE = 200
+DEFAULT_ANGLES = 300
+
+
+def scenario_grid(extent, size):
+    # `size` samples across x, square pixels in y like the GUI map
+    x0, x1, y0, y1 = extent
+    ny = max(2, int(round(size * (y1 - y0) / (x1 - x0))))
+    return np.linspace(x0, x1, size), np.linspace(y0, y1, ny)
+
+
+def render_scenario(path, out_dir, size=DEFAULT_SIZE, angles=DEFAULT_ANGLES, formats=('npy', 'png'),
+                    precision='double', memory_budget=None, mode='coherent', far_field_tolerance=None,
+                    backend='numpy'):
+    # memory_budget (bytes) switches the field to the tiled evaluator
+    start = time.perf_counter()
+    scenario = Scenario.load_scenario(path)
+    arrays = scenario["arrays"]
+    target = scenario["target"] if scenario["follow_target"] else None
+    if target is not None:
+        for array in arrays:
+            array.set_steering_target(targetx=target[0], targety=target[1])
+
+    extent = FieldEngine.scene_extent(arrays, target)
+    x, y = scenario_grid(extent, size)
+    theta = np.linspace(0, -np.pi, angles)
+    patterns = np.array([array.calculate_beam_pattern(theta) for array in arrays]).reshape(len(arrays), angles)
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    base = os.path.join(out_dir, name)
+    outputs = []
+    if memory_budget is not None:
+        # The .npy is the tiled evaluator's backing store, so it is always kept
+        _, vrange = TiledField.tiled_field(arrays, x, y, f"{base}_field.npy", memory_budget, precision,
+                                           mode=mode, far_field_tolerance=far_field_tolerance, backend=backend)
+        outputs.append(f"{base}_field.npy")
+        if 'png' in formats:
+            TiledField.write_field_png(f"{base}_field.npy", f"{base}_field.png", vrange,
+                                       memory_budget=memory_budget)
+            outputs.append(f"{base}_field.png")
+        field = None
+    else:
+        field = FieldEngine.scene_field(arrays, x, y, mode, precision=precision,
+                                        far_field_tolerance=far_field_tolerance, backend=backend)
+    if 'npy' in formats:
+        if field is not None:
+            np.save(f"{base}_field.npy", field)
+            outputs.append(f"{base}_field.npy")
+        np.save(f"{base}_beam.npy", patterns)
+        outputs.append(f"{base}_beam.npy")
+    if 'png' in formats:
+        if field is not None:
+            write_field_png(f"{base}_field.png", field, extent, target)
+            outputs.append(f"{base}_field.png")
+        write_beam_png(f"{base}_beam.png", theta, patterns)
+        outputs.append(f"{base}_beam.png")
+    return path, outputs, time.perf_counter() - start
+
+
+def write_field_png(path, field, extent, target=None):
+    # matplotlib is only loaded when an image is actually requested
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 4))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot(111)
+    im = ax.imshow(field, extent=extent, aspect='equal', cmap='jet', origin='lower')
+    figure.colorbar(im, ax=ax, orientation='vertical', fraction=0.046, pad=0.04, shrink=0.8)
+    if target is not None:
+        ax.plot(target[0], target[1], 'g*', markersize=15, label='Target Point')
+        ax.legend()
+    ax.set_xlabel('x (m)')
+    ax.set_ylabel('y (m)')
+    figure.savefig(path, dpi=150)
+
+
+def write_beam_png(path, theta, patterns):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(8, 5))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot(111, projection='polar')
+    ax.set_thetamin(-180)
+    ax.set_thetamax(0)
+    ax.set_theta_zero_location('E')
+    ax.set_theta_direction(-1)
+    for i, af in enumerate(patterns):
+        # Same normalisation as the beam-profile panel
+        af_norm = np.clip(af - np.max(af), -40, 0)
+        ax.plot(theta, af_norm, label=f"Array {i + 1}")
+    ax.set_rlim(-40, 0)
+    ax.set_rticks(np.arange(-40, 1, 10))
+    ax.grid(True)
+    if len(patterns):
+        ax.legend(loc='lower left', fontsize='small')
+    figure.savefig(path, dpi=150)
+
+
+def expand_paths(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(matches if matches else [pattern])
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', default=[os.path.join('scenarios', '*.json')],
+                        help='scenario files or glob patterns (default: scenarios/*.json)')
+    parser.add_argument('--out', default='renders', help='output directory')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE, help='field samples along x')
+    parser.add_argument('--angles', type=int, default=DEFAULT_ANGLES, help='beam-pattern angles')
+    parser.add_argument('--format', choices=['npy', 'png', 'all'], default='all')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='processes rendering files in parallel')
+    parser.add_argument('--precision', choices=sorted(FieldEngine.PRECISIONS), default='double')
+    parser.add_argument('--combine', choices=FieldEngine.COMBINE_MODES, default='coherent',
+                        help='how the arrays add up')
+    parser.add_argument('--far-field', type=float, metavar='DB',
+                        help='use the far-field form wherever it is within DB of the exact field')
+    parser.add_argument('--backend', choices=['auto', *FieldEngine.BACKENDS], default='auto',
+                        help="element-sum kernel; 'auto' uses this machine's timed choice "
+                             "(BackendSelection), unavailable ones fall back to numpy")
+    parser.add_argument('--tiled', action='store_true',
+                        help='evaluate the field out of core, tile by tile')
+    parser.add_argument('--memory', type=int, default=TiledField.DEFAULT_MEMORY_BUDGET // 2**20,
+                        help='working memory per process in MB with --tiled')
+    args = parser.parse_args(argv)
+
+    paths = expand_paths(args.scenarios)
+    formats = ('npy', 'png') if args.format == 'all' else (args.format,)
+    os.makedirs(args.out, exist_ok=True)
+    start = time.perf_counter()
+    memory_budget = args.memory * 2**20 if args.tiled else None
+    backend = BackendSelection.select_backend() if args.backend == 'auto' else args.backend
+    jobs = [(path, args.out, args.size, args.angles, formats, args.precision, memory_budget, args.combine,
+             args.far_field, backend) for path in paths]
+    failed = 0
+    if args.workers <= 1 or len(jobs) <= 1:
+        results = (_render_job(job) for job in jobs)
+        failed = _report(results)
+    else:
+        # Not forked from this process: timing the backends above may have
+        # started Numba's OpenMP threads, which a forked child cannot use
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs)),
+                                 mp_context=ParallelField._mp_context()) as executor:
+            failed = _report(executor.map(_render_job, jobs))
+    print(f"{len(paths) - failed}/{len(paths)} scenarios rendered in {time.perf_counter() - start:.2f} s")
+    return 1 if failed else 0
+
+
+def _render_job(job):
+    try:
+        return render_scenario(*job), None
+    except Exception as e:
+        return (job[0], [], 0.0), e
+
+
+def _report(results):
+    failed = 0
+    for (path, outputs, elapsed), error in results:
+        if error is not None:
+            failed += 1
+            print(f"FAILED {path}: {error}")
+        else:
+            print(f"{path}: {len(outputs)} files in {elapsed:.2f} s")
+    return failed
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
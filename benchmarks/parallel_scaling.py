@@ -0,0 +1,50 @@
+"""Interference-map scaling of the process-pool mode from 1 to N workers.
+
+    python benchmarks/parallel_scaling.py scenarios/carStereo.json --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ParallelField
+import Scenario
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenario')
+    parser.add_argument('--size', type=int, default=400, help='grid points per axis')
+    parser.add_argument('--max-workers', type=int, default=ParallelField.default_workers())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    arrays = Scenario.load_scenario(args.scenario)["arrays"]
+    x = np.linspace(-15, 15, args.size)
+    y = np.linspace(0, 10, args.size)
+
+    start = time.perf_counter()
+    expected = [array.calculate_field(x, y) for array in arrays]
+    serial = time.perf_counter() - start
+    print(f"{len(arrays)} arrays, {args.size}x{args.size} grid")
+    print(f"serial     {serial * 1e3:9.1f} ms")
+
+    for workers in range(1, args.max_workers + 1):
+        # First call warms the pool up
+        ParallelField.calculate_fields(arrays, x, y, workers)
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fields = ParallelField.calculate_fields(arrays, x, y, workers)
+            best = min(best, time.perf_counter() - start)
+        error = max(np.max(np.abs(a - b)) for a, b in zip(fields, expected))
+        print(f"{workers:2d} workers {best * 1e3:9.1f} ms  speedup {serial / best:5.2f}x  max |err| {error:.1e} dB")
+    ParallelField.shutdown_executor()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""Benchmark suite for the Array physics and the render pipeline.
+
+    python benchmarks/suite.py                   # quick profile, compare with this machine's baseline
+    python benchmarks/suite.py --profile full --save
+    python benchmarks/suite.py --filter field/grid --threshold 0.1
+
+Each case is timed `--repeat` times after one warm-up run and the median is
+compared with the baseline stored for this machine in
+benchmarks/baselines/<machine>.json. Cases slower than the baseline by more
+than `--threshold` are reported as regressions and the exit status is 1.
+The widget cases run on Qt's offscreen platform, so no display is needed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Array import Array, FrequencyComponent
+from BackendSelection import machine_info
+import FieldEngine
+
+BASELINE_DIR = os.path.join(ROOT, 'benchmarks', 'baselines')
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_REPEAT = 5
+# Widget size used for the render-pipeline cases, so their grid does not
+# depend on the screen
+WIDGET_SIZE = (1000, 500)
+# Component frequencies of the field/tones cases, at 128 elements and next
+# to the reference loop: whole-multiple series share one phasor per element
+# (FieldEngine.harmonic_groups), so they are much faster than the others
+TONES = {
+    'single': (1000,),
+    'harmonic': (1000, 2000, 3000, 4000),
+    'nonharmonic': (1000, 1300, 1700, 2300),
+}
+# Components of the field/components=*/nonharmonic cases, taken in order:
+# no frequency is a whole multiple of another
+NONHARMONIC = (1000, 1300, 1700, 2300, 2900, 3100, 3700, 4300)
+
+PROFILES = {
+    'quick': {
+        'field_grids': (100, 200, 500),
+        'field_elements': (1, 8, 32, 128),
+        'field_components': (1, 2, 4),
+        'beam_elements': (1, 8, 32, 128),
+        'beam_components': (1, 4),
+        'beam_angles': (300,),
+    },
+    'full': {
+        'field_grids': (100, 200, 500, 1000, 2000),
+        'field_elements': (1, 8, 16, 32, 64, 128),
+        'field_components': (1, 2, 4, 8),
+        'beam_elements': (1, 8, 16, 32, 64, 128),
+        'beam_components': (1, 2, 4, 8),
+        'beam_angles': (300, 3600),
+    },
+}
+
+
+def make_array(num_elements=8, components=1, frequencies=None):
+    # `components` harmonics of 1 kHz unless `frequencies` are given
+    array = Array(center=(0, 0), num_elements=num_elements, spacing=0.05, curvature=0.1, rotation=0)
+    array.set_steering_angle(20)
+    if frequencies is None:
+        frequencies = [1000 * (i + 1) for i in range(components)]
+    array.components = [FrequencyComponent(frequency=frequency, phase=0.3 * i, amplitude=1.0 / (i + 1))
+                        for i, frequency in enumerate(frequencies)]
+    return array
+
+
+def field_case(size, num_elements, components, backend='numpy', frequencies=None):
+    array = make_array(num_elements, components, frequencies)
+    x = np.linspace(-15, 15, size)
+    y = np.linspace(0, 10, size)
+    return lambda: array.calculate_field(x, y, backend=backend)
+
+
+def beam_case(angles, num_elements, components):
+    array = make_array(num_elements, components)
+    theta = np.linspace(0, -np.pi, angles)
+    return lambda: array.calculate_beam_pattern(theta)
+
+
+def physics_cases(profile):
+    # One parameter varied at a time around 200x200, 8 elements, 1 component
+    cases = {}
+    for size in profile['field_grids']:
+        cases[f'field/grid={size}x{size}'] = field_case(size, 8, 1)
+    for n in profile['field_elements']:
+        cases[f'field/elements={n}'] = field_case(200, n, 1)
+    for c in profile['field_components']:
+        cases[f'field/components={c}'] = field_case(200, 8, c)
+        if c > 1:
+            cases[f'field/components={c}/nonharmonic'] = field_case(200, 8, c, frequencies=NONHARMONIC[:c])
+    for backend, (_, installed) in FieldEngine.BACKENDS.items():
+        if not installed():
+            continue
+        for name, frequencies in TONES.items():
+            cases[f'field/backend={backend}/tones={name}'] = field_case(200, 128, None, backend, frequencies)
+        if backend in ('numpy', 'reference'):
+            continue
+        # The warm-up run includes any compilation
+        for n in profile['field_elements']:
+            cases[f'field/backend={backend}/elements={n}'] = field_case(200, n, 1, backend)
+    for angles in profile['beam_angles']:
+        for n in profile['beam_elements']:
+            for c in profile['beam_components']:
+                cases[f'beam/angles={angles}/elements={n}/components={c}'] = beam_case(angles, n, c)
+    return cases
+
+
+def widget_cases():
+    # Qt is only needed here; the offscreen platform works without a display
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from BeamPattern import PolarPlotWidget
+    from InterferenceMap import FieldPlotWidget
+
+    app = QApplication.instance() or QApplication([])
+    arrays = [make_array(16, 2), make_array(8, 1)]
+    arrays[1].center = np.array([4.0, 0.0])
+    field_plot = FieldPlotWidget()
+    field_plot.resize(*WIDGET_SIZE)
+    polar_plot = PolarPlotWidget()
+    polar_plot.resize(*WIDGET_SIZE)
+    app.processEvents()
+
+    def field_cold():
+        # The element bases are kept apart from the fields
+        field_plot.field_cache.clear()
+        field_plot.field_cache.basis_cache.clear()
+        field_plot.update_plot(arrays)
+
+    def field_cached():
+        field_plot.update_plot(arrays)
+
+    steering = iter(np.tile(np.linspace(-60, 60, 25), 10**6))
+
+    def polar_update():
+        # A new steering angle each call, as when dragging the slider
+        arrays[0].set_steering_angle(next(steering))
+        polar_plot.update_plot(arrays[0])
+
+    return {
+        'widget/field_update_plot_cold': field_cold,
+        'widget/field_update_plot_cached': field_cached,
+        'widget/polar_update_plot': polar_update,
+    }, (app, field_plot, polar_plot)
+
+
+def time_case(run, repeat):
+    run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return {'median': statistics.median(times), 'min': min(times), 'repeat': repeat}
+
+
+def machine_tag(info):
+    # Baselines are only comparable on the same hardware, library versions
+    # and installed backends (BackendSelection.machine_info)
+    key = json.dumps(info, sort_keys=True).encode()
+    return f"{info['system']}-{info['machine']}-{hashlib.blake2b(key, digest_size=6).hexdigest()}".lower()
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('results', {}).get(name)
+        if reference is None:
+            continue
+        ratio = result['median'] / reference['median']
+        result['baseline'] = reference['median']
+        result['ratio'] = ratio
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='quick')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this')
+    parser.add_argument('--no-widgets', action='store_true', help='skip the Qt render-pipeline cases')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed slowdown against the baseline (0.25 = 25%%)')
+    parser.add_argument('--baseline', help='baseline file (default: baselines/<machine>.json)')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    info = machine_info()
+    tag = machine_tag(info)
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{tag}.json")
+
+    cases = physics_cases(PROFILES[args.profile])
+    keep_alive = None
+    if not args.no_widgets:
+        widgets, keep_alive = widget_cases()
+        cases.update(widgets)
+    cases = {name: run for name, run in cases.items() if args.filter in name}
+
+    print(f"machine {tag}: {info['cpu']}, {info['cpus']} CPUs, numpy {info['numpy']}")
+    results = {}
+    for name, run in cases.items():
+        results[name] = time_case(run, args.repeat)
+        print(f"{name:48s} {results[name]['median'] * 1e3:10.2f} ms")
+
+    regressions = []
+    if os.path.exists(baseline_path) and not args.save:
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        print(f"\nagainst {os.path.relpath(baseline_path)} (threshold +{args.threshold:.0%}):")
+        for name, result in results.items():
+            if 'ratio' in result:
+                flag = '  REGRESSION' if name in regressions else ''
+                print(f"{name:48s} {result['ratio']:6.2f}x{flag}")
+    elif not args.save:
+        print(f"\nno baseline for this machine; run with --save to create {os.path.relpath(baseline_path)}")
+
+    report = {'machine': info, 'tag': tag, 'profile': args.profile, 'repeat': args.repeat,
+              'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}
+    if args.save:
+        os.makedirs(os.path.dirname(baseline_path) or '.', exist_ok=True)
+        with open(baseline_path, 'w') as file:
+            json.dump(report, file, indent=4)
+        print(f"\nbaseline saved to {os.path.relpath(baseline_path)}")
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=4)
+    del keep_alive
+    if regressions:
+        print(f"\n{len(regressions)} regression(s)")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,128 @@
+"""Check every field backend against the reference loop.
+
+    python check_backends.py                     # every scenarios/*.json
+    python check_backends.py scenarios/5G.json --examples 50 --seed 7
+
+Each array of each scenario is checked as saved and in --examples random
+variations (steering, element count, spacing, phases, amplitudes, grid
+size and extent, precision). A backend passes when, at every pixel, its
+distance from FieldEngine.reference_field is within the tolerance of the
+precision times S, the sum of the magnitudes of the element terms there.
+Exits with 1 on any failure, printing the failing cases with their seed.
+"""
+import argparse
+import copy
+import sys
+
+import numpy as np
+
+from Array import FrequencyComponent
+import FieldEngine
+import Scenario
+from batch_render import expand_paths
+
+DEFAULT_EXAMPLES = 20
+DEFAULT_SEED = 0
+# Relative to S. Double is limited by float64 rounding of R in the phase;
+# single by the float32 phase error in FieldEngine.PRECISIONS, added per case
+DOUBLE_TOL = 1e-9
+SINGLE_TOL = 1e-5
+MAX_ELEMENTS = 64
+MAX_GRID = 120
+
+
+def term_magnitudes(array, x, y):
+    # S at every pixel: sum over components and elements of |w| exp(-alpha R) / R
+    x_n, y_n = FieldEngine.element_positions(array)
+    S = np.zeros((len(y), len(x)))
+    R_max = 0.0
+    for n in range(array.num_elements):
+        R = np.hypot(x[None, :] - x_n[n], y[:, None] - y_n[n])
+        R_max = max(R_max, float(R.max()))
+        for comp in array.components:
+            alpha = comp.frequency / (1e6 * array.c)
+            S += abs(comp.amplitude) * np.exp(-alpha * R) / (R + np.finfo(float).eps)
+    return S, R_max
+
+
+def tolerance(array, precision, R_max):
+    if precision == 'double':
+        return DOUBLE_TOL
+    f_max = max(comp.frequency for comp in array.components)
+    return SINGLE_TOL + 2 * np.pi * 4 * 2.0**-24 * R_max * f_max / array.c
+
+
+def variation(array, extent, rng):
+    # A random neighbour of `array` and a grid around `extent`
+    array = copy.deepcopy(array)
+    array.num_elements = int(rng.integers(1, MAX_ELEMENTS + 1))
+    array.spacing = array.spacing * 2.0**rng.uniform(-1, 1)
+    array.steering_angle = rng.uniform(-90, 90)
+    array.components = [FrequencyComponent(comp.frequency, rng.uniform(0, 2 * np.pi), rng.uniform(0.1, 2.0))
+                        for comp in array.components]
+    x0, x1, y0, y1 = extent
+    scale = 2.0**rng.uniform(-2, 1)
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    x = np.linspace(cx - (cx - x0) * scale, cx + (x1 - cx) * scale, int(rng.integers(2, MAX_GRID + 1)))
+    y = np.linspace(cy - (cy - y0) * scale, cy + (y1 - cy) * scale, int(rng.integers(2, MAX_GRID + 1)))
+    precision = str(rng.choice(list(FieldEngine.PRECISIONS)))
+    return array, x, y, precision
+
+
+def check_case(array, x, y, precision, backends):
+    # {backend: worst |F - reference| / S} for one array and grid
+    expected = FieldEngine.reference_field(array, x, y)
+    S, R_max = term_magnitudes(array, x, y)
+    S = np.maximum(S, np.finfo(float).tiny)
+    errors = {}
+    for name in backends:
+        field = FieldEngine.complex_field(array, x, y, precision=precision, backend=name)
+        errors[name] = float(np.max(np.abs(field - expected) / S))
+    return errors, tolerance(array, precision, R_max)
+
+
+def check_scenario(path, examples, seed, backends):
+    # Failure messages for every array of the scenario at `path`
+    scenario = Scenario.load_scenario(path)
+    extent = FieldEngine.scene_extent(scenario['arrays'], scenario['target'])
+    x, y = np.linspace(extent[0], extent[1], 100), np.linspace(extent[2], extent[3], 100)
+    failures = []
+    for index, array in enumerate(scenario['arrays']):
+        rng = np.random.default_rng([seed, index])
+        cases = [(array, x, y, 'double')]
+        cases += [variation(array, extent, rng) for _ in range(examples)]
+        for example, (case, cx, cy, precision) in enumerate(cases):
+            errors, tol = check_case(case, cx, cy, precision, backends)
+            for name, error in errors.items():
+                if not error <= tol:
+                    failures.append(f"{path} array {index} example {example} (seed {seed}): {name} is "
+                                    f"{error:.2e} of S from the reference in {precision}, tolerance {tol:.2e}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('scenarios', nargs='*', default=['scenarios/*.json'],
+                        help='scenario files or glob patterns (default: scenarios/*.json)')
+    parser.add_argument('--examples', type=int, default=DEFAULT_EXAMPLES,
+                        help='random variations per array (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='default: %(default)s')
+    args = parser.parse_args(argv)
+
+    paths = expand_paths(args.scenarios)
+    if not paths:
+        parser.error('no scenario files found')
+    backends = [name for name in FieldEngine.BACKENDS if FieldEngine.backend_available(name)]
+    skipped = [name for name in FieldEngine.BACKENDS if name not in backends]
+    print(f"Checking {', '.join(backends)}" + (f" (unavailable: {', '.join(skipped)})" if skipped else ''))
+    failures = []
+    for path in paths:
+        failures += check_scenario(path, args.examples, args.seed, backends)
+    for failure in failures:
+        print(failure)
+    print(f"{len(paths)} scenarios, {len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
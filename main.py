@@ -1,13 +1,20 @@
-import json
 import sys
+import time
 import numpy as np
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import *
 from PyQt5.QtWidgets import QFileDialog
-from Array import Array, FrequencyComponent
+from Array import Array
+import BackendSelection
+import FieldEngine
 
 from mainwin import Ui_MainWindow
 from InterferenceMap import FieldPlotWidget
 from BeamPattern import PolarPlotWidget
+from RenderScheduler import RenderScheduler
+from ComputeWorker import ComputeDispatcher
+import Scenario
+from Profiler import profiler, span
 import os
 import logging
 # Configure logging
@@ -23,18 +30,28 @@ logging.basicConfig(
 # Create logger instance
 logger = logging.getLogger('beam_forming')
 
+# Stages shown in the status bar, in display order
+HUD_STAGES = ('interaction', 'state sync', 'field compute', 'dB conversion', 'imshow/colorbar',
+              'field draw', 'animation frame', 'polar compute', 'polar draw', 'polar blit', 'list rebuild')
+HUD_INTERVAL_MS = 500
+# Far-field approximation choices, in dB of the coherent peak rather than of
+# the local level (FarField.hybrid_field), so levels in nulls can be off by more
+FAR_FIELD_TOLERANCES = ((None, 'Off (exact)'), (0.1, '0.1 dB of peak'), (0.5, '0.5 dB of peak'),
+                        (1.0, '1 dB of peak'))
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
+        self.render_scheduler = RenderScheduler(self.render_simulation, parent=self)
         self.setup_plots()
         self.setup_controls()
         self.block = False
         self.arrays:list[Array] = []
-        # self.timer = QTimer()
-        # self.timer.timeout.connect(self.update_simulation)
-        # self.timer.start(100)
+        # perf_counter() of the render whose field has not arrived yet
+        self.render_started = None
+        self.setup_timing_hud()
 
     def setup_plots(self):
         logger.info('Setting up plots...')
@@ -43,9 +60,16 @@ class MainWindow(QMainWindow):
         beam_layout.addWidget(self.polar_plot)
         beam_layout.setContentsMargins(0, -5, 0, -5)
         self.field_plot = FieldPlotWidget()
+        # Timed once per machine on first launch, then read back
+        self.field_plot.set_backend(BackendSelection.select_backend())
         interference_layout = QVBoxLayout(self.ui.InterferenceMap)
         interference_layout.addWidget(self.field_plot)
         interference_layout.setContentsMargins(0, 0, 0, 0)
+        self.field_plot.resized.connect(self.update_simulation)
+        self.compute = ComputeDispatcher(self.field_plot, self.polar_plot, parent=self)
+        self.compute.field_ready.connect(self.on_field_ready)
+        self.compute.harmonics_ready.connect(self.on_harmonics_ready)
+        self.compute.pattern_ready.connect(self.polar_plot.show_pattern)
     def setup_controls(self):
         logger.info('Setting up controls...')
         self.ui.addArrayButton.clicked.connect(self.add_array)
@@ -66,7 +90,6 @@ class MainWindow(QMainWindow):
         self.ui.removeFrequencyButton.clicked.connect(self.remove_frequency)
         # self.ui.plotTabs.currentChanged.connect(self.update_simulation)
         self.ui.comboBox.currentIndexChanged.connect(self.update_selected_array)
-        self.ui.rotation.valueChanged.connect(self.update_selected_array)
         self.ui.comboBox_2.addItems(['Hz', 'kHz', 'MHz'])
 
         self.ui.saveScenarioButton.clicked.connect(self.save_scenario)
@@ -80,8 +103,174 @@ class MainWindow(QMainWindow):
         self.ui.comboBox_2.currentIndexChanged.connect(self.update_selected_frequency)
         # self.ui.frequencyList.currentRowChanged.connect(self.update_selected_frequency)
 
+        compute_menu = self.ui.menubar.addMenu('Compute')
+        mode_group = QActionGroup(self)
+        for mode, label in (('serial', 'Serial'), ('process', 'Process pool')):
+            action = compute_menu.addAction(label)
+            action.setCheckable(True)
+            action.setChecked(mode == self.field_plot.execution_mode)
+            action.triggered.connect(lambda checked, mode=mode: self.set_execution_mode(mode))
+            mode_group.addAction(action)
+        compute_menu.addSeparator()
+        progressive_action = compute_menu.addAction('Progressive refinement')
+        progressive_action.setCheckable(True)
+        progressive_action.setChecked(self.field_plot.progressive)
+        progressive_action.toggled.connect(self.set_progressive)
+        single_action = compute_menu.addAction('Single precision (float32)')
+        single_action.setCheckable(True)
+        single_action.setChecked(self.field_plot.field_cache.precision == 'single')
+        single_action.toggled.connect(lambda checked: self.set_precision('single' if checked else 'double'))
+        backend_menu = compute_menu.addMenu('Field kernel')
+        backend_group = QActionGroup(self)
+        self.backend_actions = {}
+        for name, (_, installed) in FieldEngine.BACKENDS.items():
+            action = backend_menu.addAction(name)
+            action.setCheckable(True)
+            action.setChecked(name == self.field_plot.field_cache.backend)
+            action.setEnabled(installed())
+            action.triggered.connect(lambda checked, name=name: self.set_backend(name))
+            backend_group.addAction(action)
+            self.backend_actions[name] = action
+        backend_menu.addSeparator()
+        backend_menu.addAction('Auto-select (time again)').triggered.connect(
+            lambda: self.set_backend(BackendSelection.select_backend(rerun=True)))
+        far_field_menu = compute_menu.addMenu('Far-field approximation')
+        far_field_group = QActionGroup(self)
+        for tolerance, label in FAR_FIELD_TOLERANCES:
+            action = far_field_menu.addAction(label)
+            action.setCheckable(True)
+            action.setChecked(tolerance == self.field_plot.field_cache.far_field_tolerance)
+            action.triggered.connect(lambda checked, tolerance=tolerance: self.set_far_field_tolerance(tolerance))
+            far_field_group.addAction(action)
+        compute_menu.addSeparator()
+        combine_group = QActionGroup(self)
+        for mode, label in (('coherent', 'Coherent sum'), ('incoherent', 'Incoherent (power) sum')):
+            action = compute_menu.addAction(label)
+            action.setCheckable(True)
+            action.setChecked(mode == self.field_plot.combine_mode)
+            action.triggered.connect(lambda checked, mode=mode: self.set_combine_mode(mode))
+            combine_group.addAction(action)
+
+        pattern_menu = self.ui.menubar.addMenu('Beam pattern')
+        dense_action = pattern_menu.addAction('Dense angular sampling')
+        dense_action.setCheckable(True)
+        dense_action.setChecked(self.polar_plot.resolution == 'dense')
+        dense_action.toggled.connect(lambda checked: self.set_pattern_resolution('dense' if checked else 'standard'))
+        zoom_action = pattern_menu.addAction('Zoom on main lobe')
+        zoom_action.setCheckable(True)
+        zoom_action.setChecked(self.polar_plot.zoom)
+        zoom_action.toggled.connect(self.set_pattern_zoom)
+
+        animation_menu = self.ui.menubar.addMenu('Animation')
+        animation_menu.addAction(self.ui.actionRun)
+        animation_menu.addAction(self.ui.actionStop)
+        self.ui.actionRun.triggered.connect(self.start_animation)
+        self.ui.actionStop.triggered.connect(self.stop_animation)
+        self.ui.actionStop.setEnabled(False)
+
+        profiling_menu = self.ui.menubar.addMenu('Profiling')
+        profiling_menu.addAction('Export timings (JSON)...').triggered.connect(
+            lambda: self.export_timings(chrome_trace=False))
+        profiling_menu.addAction('Export Chrome trace...').triggered.connect(
+            lambda: self.export_timings(chrome_trace=True))
+        profiling_menu.addAction('Reset timings').triggered.connect(profiler.clear)
+
         self.populate_scenario_select()
 
+    def setup_timing_hud(self):
+        self.target_level_label = QLabel()
+        self.ui.statusbar.addPermanentWidget(self.target_level_label)
+        self.timing_label = QLabel()
+        self.ui.statusbar.addPermanentWidget(self.timing_label)
+        self.timing_timer = QTimer(self)
+        self.timing_timer.timeout.connect(self.update_timing_hud)
+        self.timing_timer.start(HUD_INTERVAL_MS)
+
+    def update_timing_hud(self):
+        stats = profiler.stats()
+        parts = [f"{name} {stats[name]['p50'] * 1e3:.1f}/{stats[name]['p95'] * 1e3:.1f}"
+                 for name in HUD_STAGES if name in stats]
+        self.timing_label.setText("p50/p95 ms: " + " | ".join(parts) if parts else "")
+
+    def export_timings(self, chrome_trace):
+        file_filter = "Trace Files (*.json);;All Files (*)"
+        title = "Export Chrome Trace" if chrome_trace else "Export Timings"
+        file_name, _ = QFileDialog.getSaveFileName(self, title, "", file_filter)
+        if not file_name:
+            return
+        try:
+            if chrome_trace:
+                profiler.export_chrome_trace(file_name)
+            else:
+                profiler.export_json(file_name)
+            logger.info(f'Timings exported to {file_name}')
+        except Exception as e:
+            logger.error(f"An error occurred while exporting timings: {e}")
+
+    def start_animation(self):
+        # Shows the instantaneous field; the next render computes the
+        # per-frequency fields it needs. Only defined for a coherent sum
+        if self.field_plot.combine_mode != 'coherent':
+            return
+        logger.info('Starting time-harmonic animation...')
+        self.field_plot.animating = True
+        self.ui.actionRun.setEnabled(False)
+        self.ui.actionStop.setEnabled(True)
+        self.update_simulation()
+
+    def stop_animation(self):
+        logger.info('Stopping animation...')
+        self.field_plot.stop_animation()
+        self.ui.actionRun.setEnabled(True)
+        self.ui.actionStop.setEnabled(False)
+        self.update_simulation()
+
+    def set_progressive(self, enabled):
+        logger.info(f'Progressive refinement {"enabled" if enabled else "disabled"}...')
+        self.field_plot.progressive = enabled
+        self.update_simulation()
+
+    def set_combine_mode(self, mode):
+        logger.info(f'Combining arrays with a {mode} sum...')
+        # Switching to 'incoherent' also stops the animation
+        self.field_plot.set_combine_mode(mode)
+        self.ui.actionRun.setEnabled(mode == 'coherent' and not self.field_plot.animating)
+        self.ui.actionStop.setEnabled(self.field_plot.animating)
+        self.update_simulation()
+
+    def set_backend(self, backend):
+        # A backend is validated (and compiled) on the first field that uses
+        # it, and quietly stays on numpy if that fails
+        logger.info(f'Switching field kernel to {backend}...')
+        self.field_plot.set_backend(backend)
+        self.backend_actions[backend].setChecked(True)
+        self.update_simulation()
+
+    def set_far_field_tolerance(self, tolerance_db):
+        logger.info(f'Far-field approximation tolerance set to {tolerance_db} dB...')
+        self.field_plot.set_far_field_tolerance(tolerance_db)
+        self.update_simulation()
+
+    def set_pattern_resolution(self, resolution):
+        logger.info(f'Beam pattern resolution set to {resolution}...')
+        self.polar_plot.set_resolution(resolution)
+        self.update_simulation()
+
+    def set_pattern_zoom(self, enabled):
+        logger.info(f'Beam pattern zoom {"enabled" if enabled else "disabled"}...')
+        self.polar_plot.zoom = enabled
+        self.update_simulation()
+
+    def set_precision(self, precision):
+        logger.info(f'Switching field computation to {precision} precision...')
+        self.field_plot.set_precision(precision)
+        self.update_simulation()
+
+    def set_execution_mode(self, mode):
+        logger.info(f'Switching field computation to {mode} mode...')
+        self.field_plot.set_execution_mode(mode)
+        self.update_simulation()
+
     def save_scenario(self):
         try:
             logger.info('Saving scenario...')
@@ -89,35 +278,9 @@ class MainWindow(QMainWindow):
             file_name, _ = QFileDialog.getSaveFileName(self, "Save Scenario", "scenarios/",
                                                        "JSON Files (*.json);;All Files (*)", options=options)
             if file_name:
-                scenario = {
-                    "arrays": [
-                        {
-                            "center": array.center.tolist(),
-                            "num_elements": array.num_elements,
-                            "spacing": array.spacing,
-                            "curvature": array.curvature,
-                            "rotation": array.rotation,
-                            "steering_angle": array.steering_angle,
-                            "type": array.type,
-                            "frequencies": [
-                                {
-                                 "frequency":comp.frequency,
-                                 "phase":comp.phase,
-                                 "amplitude":comp.amplitude
-                                } 
-                                for comp in array.components
-                            ]
-                        }
-                        for array in self.arrays
-                    ],
-                    "target": {
-                        "x": self.ui.xPosition_target.value(),
-                        "y": self.ui.yPosition_target.value()
-                    },
-                    "follow_target": self.ui.follow_target_checkBox.isChecked()
-                }
-                with open(file_name, 'w') as file:
-                    json.dump(scenario, file, indent=4)
+                Scenario.save_scenario(file_name, self.arrays,
+                                       (self.ui.xPosition_target.value(), self.ui.yPosition_target.value()),
+                                       self.ui.follow_target_checkBox.isChecked())
                 # print("Scenario saved successfully.")
                 self.populate_scenario_select()
         except Exception as e:
@@ -130,60 +293,27 @@ class MainWindow(QMainWindow):
         file_name, _ = QFileDialog.getOpenFileName(self, "Load Scenario", "", "JSON Files (*.json);;All Files (*)",
                                                    options=options)
         if file_name:
-            with open(file_name, 'r') as file:
-                scenario = json.load(file)
-                self.arrays.clear()
-                self.ui.arrayList.clear()
-                for array_data in scenario["arrays"]:
-                    array = Array(
-                        center=array_data["center"],
-                        num_elements=array_data["num_elements"],
-                        spacing=array_data["spacing"],
-                        curvature=array_data["curvature"],
-                        rotation=array_data["rotation"],
-                        type=array_data["type"]
-                    )
-                    array.set_steering_angle(array_data["steering_angle"])
-                    components = [FrequencyComponent(**comp) for comp in array_data["frequencies"]]
-                    array.components = components
-                    self.arrays.append(array)
-                    self.ui.arrayList.addItem(f"Array {len(self.arrays)}")
-                if self.arrays:
-                    self.ui.arrayList.setCurrentRow(0)
-                self.ui.xPosition_target.setValue(scenario["target"]["x"])
-                self.ui.yPosition_target.setValue(scenario["target"]["y"])
-                self.ui.follow_target_checkBox.setChecked(scenario["follow_target"])
-                self.update_selected_array()
+            self.apply_scenario(Scenario.load_scenario(file_name))
 
     def load_selected_scenario(self, index):
         logger.info('Loading selected scenario...')
         file_name = self.ui.scenarioSelect.currentText()
         if file_name:
             file_path = os.path.join("scenarios", file_name)
-            with open(file_path, 'r') as file:
-                scenario = json.load(file)
-                self.arrays.clear()
-                self.ui.arrayList.clear()
-                for array_data in scenario["arrays"]:
-                    array = Array(
-                        center=array_data["center"],
-                        num_elements=array_data["num_elements"],
-                        spacing=array_data["spacing"],
-                        curvature=array_data["curvature"],
-                        rotation=array_data["rotation"],
-                        type=array_data["type"]
-                    )
-                    array.set_steering_angle(array_data["steering_angle"])
-                    components = [FrequencyComponent(**comp) for comp in array_data["frequencies"]]
-                    array.components = components
-                    self.arrays.append(array)
-                    self.ui.arrayList.addItem(f"Array {len(self.arrays)}")
-                if self.arrays:
-                    self.ui.arrayList.setCurrentRow(0)
-                self.ui.xPosition_target.setValue(scenario["target"]["x"])
-                self.ui.yPosition_target.setValue(scenario["target"]["y"])
-                self.ui.follow_target_checkBox.setChecked(scenario["follow_target"])
-                self.update_selected_array()
+            self.apply_scenario(Scenario.load_scenario(file_path))
+
+    def apply_scenario(self, scenario):
+        self.arrays.clear()
+        self.ui.arrayList.clear()
+        for array in scenario["arrays"]:
+            self.arrays.append(array)
+            self.ui.arrayList.addItem(f"Array {len(self.arrays)}")
+        if self.arrays:
+            self.ui.arrayList.setCurrentRow(0)
+        self.ui.xPosition_target.setValue(scenario["target"][0])
+        self.ui.yPosition_target.setValue(scenario["target"][1])
+        self.ui.follow_target_checkBox.setChecked(scenario["follow_target"])
+        self.update_selected_array()
 
     def populate_scenario_select(self):
         logger.info('Populating scenario select...')
@@ -340,7 +470,43 @@ class MainWindow(QMainWindow):
             self.update_simulation()
 
     def update_simulation(self):
+        # Coalesced: renders at most once per display frame with the latest state
+        self.render_scheduler.request()
+
+    def render_simulation(self):
         # logger.info('Updating simulation...')
+        if self.render_started is None:
+            self.render_started = time.perf_counter()
+        with span('state sync'):
+            selected_array = self.sync_state()
+        self.update_target_level()
+        with span('list rebuild'):
+            self.rebuild_frequency_list()
+        if len(self.arrays) == 0:return
+        self.block = False
+        array:Array = self.arrays[0 if len(self.arrays) == selected_array else selected_array]
+        logger.info(f"Selected array data:\n"
+               f"Center: {array.center}\n"
+               f"Number of elements: {array.num_elements}\n"
+               f"Spacing: {array.spacing}\n"
+               f"Curvature: {array.curvature}\n"
+               f"Rotation: {array.rotation}\n"
+               f"Steering angle: {array.steering_angle}\n"
+               f"Array speed: {array.c}")
+
+    def update_target_level(self):
+        # Probes only the target point, so it is cheap enough for every render
+        if len(self.arrays) == 0:
+            self.target_level_label.setText("")
+            return
+        with span('target probe'):
+            level = FieldEngine.probe_scene(self.arrays, self.ui.xPosition_target.value(),
+                                            self.ui.yPosition_target.value(), self.field_plot.combine_mode,
+                                            self.field_plot.field_cache.precision)
+        self.target_level_label.setText(f"Level at target: {float(level):.1f} dB")
+
+    def sync_state(self):
+        # Pushes the controls into the arrays and hands a snapshot to the worker
         selected_array = self.ui.arrayList.currentRow()
         self.block = True
         if self.ui.follow_target_checkBox.isChecked():
@@ -357,11 +523,20 @@ class MainWindow(QMainWindow):
                 array = self.arrays[selected_array]
                 array.set_steering_angle(self.ui.steeringAngle.value())
         
-        self.field_plot.update_plot(self.arrays)
-        if self.ui.follow_target_checkBox.isChecked():
-            self.field_plot.plot_target_point(self.ui.xPosition_target.value(), self.ui.yPosition_target.value())
-        if selected_array >= 0 and selected_array < len(self.arrays):
-            self.polar_plot.update_plot(self.arrays[selected_array])
+        if len(self.arrays) == 0:
+            self.compute.cancel()
+            self.render_started = None
+            self.field_plot.clear_plot()
+        else:
+            selected = selected_array if 0 <= selected_array < len(self.arrays) else None
+            target = None
+            if self.ui.follow_target_checkBox.isChecked():
+                target = (self.ui.xPosition_target.value(), self.ui.yPosition_target.value())
+            self.field_plot.fit_extent(self.arrays, target)
+            self.compute.submit(self.arrays, selected)
+        return selected_array
+
+    def rebuild_frequency_list(self):
         current_index = self.ui.frequencyList.currentRow()
         self.ui.frequencyList.clear()
         current_row = self.ui.arrayList.currentRow()
@@ -377,17 +552,33 @@ class MainWindow(QMainWindow):
                 comp = array.components[current_index]
 
                 self.ui.frequencyList.setCurrentRow(current_index)
-        if len(self.arrays) == 0:return
-        self.block = False
-        array:Array = self.arrays[0 if len(self.arrays) == selected_array else selected_array]
-        logger.info(f"Selected array data:\n"
-               f"Center: {array.center}\n"
-               f"Number of elements: {array.num_elements}\n"
-               f"Spacing: {array.spacing}\n"
-               f"Curvature: {array.curvature}\n"
-               f"Rotation: {array.rotation}\n"
-               f"Steering angle: {array.steering_angle}\n"
-               f"Array speed: {array.c}")
+
+    def on_field_ready(self, x, y, field):
+        self.field_plot.show_field(field, [x[0], x[-1], y[0], y[-1]])
+        self.field_shown()
+
+    def on_harmonics_ready(self, x, y, harmonics):
+        if not self.field_plot.animating:
+            return
+        self.field_plot.animate(harmonics, [x[0], x[-1], y[0], y[-1]])
+        self.field_shown()
+
+    def field_shown(self):
+        if self.ui.follow_target_checkBox.isChecked():
+            self.field_plot.plot_target_point(self.ui.xPosition_target.value(), self.ui.yPosition_target.value())
+        else:
+            self.field_plot.hide_target_point()
+        if self.render_started is not None:
+            # From the first render of a burst of edits to the first field on screen
+            profiler.record('interaction', self.render_started, time.perf_counter())
+            self.render_started = None
+
+    def closeEvent(self, event):
+        self.compute.cancel()
+        self.compute.wait()
+        stats = self.render_scheduler.stats()
+        logger.info(f"Renders requested: {stats['requested']}, executed: {stats['executed']}")
+        super().closeEvent(event)
   
 
 